@@ -1,8 +1,26 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Optional, Union, Tuple, List, Dict
+from typing import Optional, Union, Tuple, List, Dict, ClassVar, Callable, Iterable, Any
+import operator
+import select
 import struct
+import warnings
 from io import BytesIO
+from collections.abc import Sequence, MutableSequence
+import instrument
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DATA_OFFSET = 0x40
+"""Start of the data block that all BINA offsets are relative to"""
+OFFSET_TABLE_NUMPY_MIN = 1024
+"""Pointer count above which the offset table is encoded with numpy when available"""
+OFFSET_TABLE_MAX_PADDING = 3
+"""Zero bytes allowed after the last offset table entry, the table is padded to 4 byte alignment"""
+POINTER_ALIGN = 8
 
 def raise_input_error(object, received, *needed):
     msg = f"\nObject \'{object}\' of type {type(object).__name__} needs one of the following input types: {[need.__name__ for need in needed]}\nReceived type \'{type(received).__name__}\' instead."
@@ -20,6 +38,11 @@ def align_bytes(bina_stream, align_to: int, write=True):
         else:
             bina_stream.read(pad)
 
+def align_offset(offset: int, align_to: int) -> int:
+    if (align_to > 0) and (offset % align_to):
+        return offset + align_to - offset % align_to
+    return offset
+
 def seek_string(bina_stream, read_by, big_endian=False) -> str:
     if big_endian:
         endianness = 'big'
@@ -33,25 +56,182 @@ def seek_string(bina_stream, read_by, big_endian=False) -> str:
     return name
 
 def read_zero_term_string(stream) -> str:
-    name = ""
+    start = stream.tell()
+    name = b""
     while True:
-        extract = stream.read(1)
-        if extract == b'\x00':
-            if name == "":
-                return None
+        extract = stream.read(64)
+        end = extract.find(b'\x00')
+        if end >= 0 or not extract:
+            name += extract[:end] if end >= 0 else extract
+            break
+        name += extract
+    stream.seek(start + len(name) + 1)
+    if name == b"":
+        return None
+    return name.decode()
+
+def read_buffer_string(buffer, offset: int) -> str:
+    """Reads a zero terminated string from any bytes-like buffer without copying the rest of it"""
+    find = getattr(buffer, 'find', None)
+    if find is not None:
+        end = find(b'\x00', offset)
+    else:
+        end = offset
+        while buffer[end] != 0:
+            end += 1
+    if end == offset:
+        return None
+    return bytes(buffer[offset:end]).decode()
+
+def read_string_at(bina_stream, offset: int) -> str:
+    cur_offset = bina_stream.tell()
+    bina_stream.seek(offset)
+    name = read_zero_term_string(bina_stream)
+    bina_stream.seek(cur_offset)
+    return name
+
+POINTER = 'P'
+"""Schema format for a 64-bit offset to another segment"""
+STRING = 'S'
+"""Schema format for a 64-bit offset to a zero terminated string"""
+
+class RecordSchema:
+    """Declarative record layout compiled once into a single struct.Struct
+
+    Fields are (name, format) or (name, RecordSchema, count) tuples. A name of None marks padding,
+    formats with a repeat count (e.g. '3f') decode to tuples and nested schemas decode to lists of tuples.
+    """
+    def __init__(self, *fields, endian='<'):
+        self.fields = fields
+        self.endian = endian
+        self.names: List[str] = []
+        self.offsets: Dict[str, int] = {}
+        self.formats: Dict[str, Union[str, RecordSchema]] = {}
+        self.repeats: Dict[str, int] = {}
+        self.pointer_fields: List[str] = []
+        self.string_fields: List[str] = []
+        self.groups: List[Tuple[int, int, Optional[RecordSchema], int]] = []
+
+        fmt = ""
+        flat_count = 0
+        for entry in fields:
+            name, part = entry[0], entry[1]
+            offset = struct.calcsize(endian + fmt)
+            if isinstance(part, RecordSchema):
+                count = entry[2]
+                fmt += part.format * count
+                width = part.flat_count * count
+                self.groups.append((flat_count, width, part, count))
+                self.repeats[name] = count
             else:
-                return name
-        else:
-            name += extract.decode()
+                if part in (POINTER, STRING):
+                    part = 'Q'
+                    (self.pointer_fields if entry[1] == POINTER else self.string_fields).append(name)
+                fmt += part
+                if name is None:
+                    continue
+                width = len(struct.unpack(endian + part, bytes(struct.calcsize(endian + part))))
+                self.groups.append((flat_count, width, None, 0 if width == 1 else width))
+            self.names.append(name)
+            self.offsets[name] = offset
+            self.formats[name] = part
+            flat_count += width
 
+        self.indices = {name: i for i, name in enumerate(self.names)}
+        self.value_fields = frozenset(self.names) - set(self.pointer_fields) - set(self.string_fields)
+        """Fields whose values end up in the encoded bytes, pointers and strings are patched in at their locations"""
+        self.pointer_indices = [self.indices[name] for name in self.pointer_fields + self.string_fields]
+        self.index_at = {self.offsets[name]: i for i, name in enumerate(self.names)}
+        self.format = fmt
+        self.flat_count = flat_count
+        self.struct = struct.Struct(endian + fmt)
+        self.size = self.struct.size
+        self.is_flat = all(group[3] == 0 for group in self.groups)
 
-@dataclass(kw_only=True, eq=False)
-class BINASegment:
-    align_to: int = field(default=4, repr=False)
-    name_segment: Optional[Union[None, StringSegment]] = field(default=None, repr=False)
-    node_location: int = field(default=0, repr=False)
-    pointers: List[Tuple[int, BINASegment]] = field(default_factory=list, repr=False)
-    """Use __post_init__ in BINASegment type classes to reset default arguments"""
+    def group(self, flat: tuple) -> tuple:
+        if self.is_flat:
+            return flat
+        values = []
+        for start, width, schema, count in self.groups:
+            if schema is not None:
+                sub_width = schema.flat_count
+                values.append([schema.group(flat[start + i * sub_width:start + (i + 1) * sub_width]) for i in range(count)])
+            elif count:
+                values.append(flat[start:start + width])
+            else:
+                values.append(flat[start])
+        return tuple(values)
+
+    def flatten(self, values) -> list:
+        if self.is_flat:
+            return values
+        flat = []
+        for value, (_, _, schema, count) in zip(values, self.groups):
+            if schema is not None:
+                for item in value:
+                    flat.extend(schema.flatten(item if isinstance(item, tuple) else schema.values_of(item)))
+            elif count:
+                flat.extend(value)
+            else:
+                flat.append(value)
+        return flat
+
+    def values_of(self, record) -> tuple:
+        return tuple(getattr(record, name) for name in self.names)
+
+    def unpack(self, data) -> tuple:
+        return self.group(self.struct.unpack(data))
+
+    def unpack_from(self, buffer, offset=0) -> tuple:
+        return self.group(self.struct.unpack_from(buffer, offset))
+
+    def iter_unpack(self, buffer):
+        for flat in self.struct.iter_unpack(buffer):
+            yield self.group(flat)
+
+    def pack(self, values) -> bytes:
+        return self.struct.pack(*self.flatten(values))
+
+    def pack_into(self, buffer, offset, values):
+        self.struct.pack_into(buffer, offset, *self.flatten(values))
+
+
+def share_string(string_segments: Dict[str, StringSegment], string_segment: StringSegment) -> StringSegment:
+    """Retains ID of the first segment registered under a name"""
+    shared = string_segments.get(string_segment.name)
+    if shared is None:
+        string_segments[string_segment.name] = string_segment
+        return string_segment
+    return shared
+
+
+def value_snapshot(values: tuple) -> Optional[tuple]:
+    """Copy of field values with every list copied, so a list edited in place no longer equals its snapshot.
+    None for values holding an array, which has no single truth value to compare with"""
+    snapshot = []
+    for value in values:
+        if isinstance(value, list):
+            value = list(value)
+        elif np is not None and isinstance(value, np.ndarray):
+            return None
+        snapshot.append(value)
+    return tuple(snapshot)
+
+def values_changed(values: tuple, snapshot: Optional[tuple]) -> bool:
+    """Arrays compare elementwise, so values holding one always count as changed"""
+    if snapshot is None:
+        return True
+    try:
+        return values != snapshot
+    except ValueError:
+        return True
+
+
+class BINARecord:
+    """Schema encoded record without any layout bookkeeping of its own.
+    Bulk records derive from this and are written by a BINARecordRun, which holds the location and pointers"""
+    __slots__ = ()
+    schema: ClassVar[Optional[RecordSchema]] = None
 
     def init_require_name(self):
         if isinstance(self.name_segment, str):
@@ -61,6 +241,65 @@ class BINASegment:
         else:
             raise_input_error(self, self.name_segment, *[str, StringSegment])
 
+    def unpack_record(self, values: tuple, get_string: Callable[[int], StringSegment]):
+        for name, value in zip(self.schema.names, values):
+            setattr(self, name, value)
+        for name in self.schema.string_fields:
+            setattr(self, name, get_string(getattr(self, name)))
+
+    def read_record(self, bina_stream):
+        values = self.schema.unpack(bina_stream.read(self.schema.size))
+        self.unpack_record(values, lambda offset: StringSegment(name=read_string_at(bina_stream, offset)))
+
+    def pack_values(self) -> list:
+        return [getattr(self, name) for name in self.schema.names]
+
+    def share_strings(self, string_segments: Dict[str, StringSegment]):
+        for name in self.schema.string_fields:
+            setattr(self, name, share_string(string_segments, getattr(self, name)))
+
+
+@dataclass(kw_only=True, eq=False)
+class BINASegment(BINARecord):
+    align_to: int = field(default=4, repr=False)
+    name_segment: Optional[Union[None, StringSegment]] = field(default=None, repr=False)
+    node_location: int = field(default=0, repr=False)
+    pointers: List[Tuple[int, BINASegment]] = field(default_factory=list, repr=False)
+    encoded: Optional[bytes] = field(default=None, repr=False, compare=False)
+    encoded_values: Any = field(default=None, repr=False, compare=False)
+    """Use __post_init__ in BINASegment type classes to reset default arguments"""
+
+    tracked_values: ClassVar[Optional[Callable[[BINASegment], Any]]] = None
+    """Getter of every value field, compared against a snapshot of the values last encoded"""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.schema is not None:
+            names = sorted(cls.schema.value_fields)
+            cls.tracked_values = operator.attrgetter(*names) if len(names) > 1 else lambda self: (getattr(self, names[0]),)
+
+    @property
+    def dirty(self) -> bool:
+        return self.encoded is None or values_changed(self.tracked_values(self), self.encoded_values)
+
+    def invalidate(self):
+        """Drops the cached encoding, for changes the value comparison cannot see"""
+        self.encoded = None
+
+    def encoded_bytes(self) -> bytes:
+        """Schema fields packed with pointer slots zeroed, cached until a value field changes.
+        Changes are found by comparing values on export, so assigning fields costs nothing extra.
+        Only the packing is skipped, layout and the offset table are still rebuilt for the whole file"""
+        current = self.tracked_values(self)
+        encoded = self.encoded
+        if encoded is None or values_changed(current, self.encoded_values):
+            values = self.pack_values()
+            for index in self.schema.pointer_indices:
+                values[index] = 0
+            encoded = self.encoded = self.schema.pack(values)
+            self.encoded_values = value_snapshot(current)
+        return encoded
+
     def add_pointer(self, stream, segment: BINASegment):
         self.pointers.append((stream.tell(), segment))
     
@@ -75,16 +314,58 @@ class BINASegment:
             align_bytes(bina_stream, self.align_to, write=False)
         
     def to_bytes(self) -> BytesIO:
-        """User implementation per segment"""
+        """User implementation per segment, segments with a schema are encoded from it by default"""
         buffer = BytesIO()
         self.clear_pointers()
+        if self.schema is not None:
+            buffer.write(self.pack_record())
+        return buffer
         
         # self.add_pointer(buffer, BINASegment())
         # return buffer
 
+    def get_pointer_targets(self) -> List[Tuple[str, BINASegment]]:
+        """Schema pointer fields to emit as (field name, target segment), strings by default"""
+        return [(name, getattr(self, name)) for name in self.schema.string_fields]
+
+    @classmethod
+    def decode(cls, values: tuple, get_string: Callable[[int], StringSegment]) -> BINASegment:
+        """Builds a record from unpacked values, copying the defaults of one blank instance instead of running __init__"""
+        blank = cls.__dict__.get('blank_attributes')
+        if blank is None:
+            blank = cls.blank_attributes = dict(cls("blank").__dict__)
+        record = cls.__new__(cls)
+        attributes = record.__dict__
+        attributes.update(blank)
+        attributes['pointers'] = []
+        record.unpack_record(values, get_string)
+        return record
+
+    def unpack_record(self, values: tuple, get_string: Callable[[int], StringSegment]):
+        attributes = self.__dict__
+        attributes.update(zip(self.schema.names, values))
+        for name in self.schema.string_fields:
+            attributes[name] = get_string(attributes[name])
+        attributes['encoded'] = None
+
+    def pack_record(self) -> bytes:
+        """Packs schema fields in one call, recording pointers relative to the record start"""
+        data = bytearray(self.encoded_bytes())
+        pointer = self.schema.endian + 'Q'
+        for name, target in self.get_pointer_targets():
+            self.pointers.append((self.schema.offsets[name], target))
+            struct.pack_into(pointer, data, self.schema.offsets[name], target.node_location)
+        self.pointers.sort(key=lambda pointer: pointer[0])
+        return bytes(data)
+
     def add_to_bina_segments(self, bina_instance: BINA):
         bina_instance.add_bina_segment(self)
 
+    def share_strings(self, string_segments: Dict[str, StringSegment]):
+        """Registers this segment's names in the string table, reusing existing instances"""
+        if isinstance(self.name_segment, StringSegment):
+            self.name_segment = share_string(string_segments, self.name_segment)
+
     def update_pointers(self):
         for i, pointer in enumerate(self.pointers):
             self.pointers[i] = (pointer[0] + self.node_location, pointer[1])
@@ -95,6 +376,37 @@ class BINASegment:
         self.update_pointers()
         bina_stream.write(buffer.getvalue())
 
+    def byte_size(self) -> int:
+        """Encoded size, segments without a schema fall back to encoding themselves"""
+        if self.schema is not None:
+            return self.schema.size
+        return self.to_bytes().getbuffer().nbytes
+
+    def layout_pointers(self):
+        """Sets absolute pointer locations once node_location is final"""
+        if self.schema is not None:
+            offsets = self.schema.offsets
+            self.pointers = sorted(((self.node_location + offsets[name], target) for name, target in self.get_pointer_targets()),
+                                   key=lambda pointer: pointer[0])
+        else:
+            self.to_bytes()
+            self.update_pointers()
+
+    def pack_into(self, buffer, offset: int):
+        """Writes the segment at offset with pointer values filled in, every target must already be laid out"""
+        if self.schema is not None:
+            encoded = self.encoded_bytes()
+            buffer[offset:offset + len(encoded)] = encoded
+            pointer = self.schema.endian + 'Q'
+            for location, target in self.pointers:
+                struct.pack_into(pointer, buffer, offset + location - self.node_location, target.node_location)
+        else:
+            data = self.to_bytes().getbuffer()
+            buffer[offset:offset + data.nbytes] = data
+            self.update_pointers()
+            for location, target in self.pointers:
+                struct.pack_into('<Q', buffer, offset + location - self.node_location, target.node_location)
+
 
 @dataclass(eq=True)
 class StringSegment(BINASegment):
@@ -103,6 +415,20 @@ class StringSegment(BINASegment):
     def __post_init__(self):
         self.align_to = 1
 
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> List[StringSegment]:
+        """Builds many segments at once, copying the attributes of one blank instance instead of running __init__"""
+        blank = dict(cls("").__dict__)
+        segments = []
+        for name in names:
+            segment = cls.__new__(cls)
+            attributes = segment.__dict__
+            attributes.update(blank)
+            attributes['pointers'] = []
+            attributes['name'] = name
+            segments.append(segment)
+        return segments
+
     def to_bytes(self) -> BytesIO:
         buffer = BytesIO()
         buffer.write(bytes(self.name, 'ascii'))
@@ -112,15 +438,312 @@ class StringSegment(BINASegment):
     
         super().from_bytes(bina_stream, seek_addr, seek_mode)
         self.name = read_zero_term_string(bina_stream)
+
+    def byte_size(self) -> int:
+        return len(self.name) + 1
+
+    def layout_pointers(self):
+        self.pointers = []
+
+    def pack_into(self, buffer, offset: int):
+        buffer[offset:offset + len(self.name)] = bytes(self.name, 'ascii')
          
 
+class BINAStringTable:
+    """String table split once into an offset -> StringSegment index, identical names share one instance"""
+    def __init__(self, buffer, offset: int, length: int):
+        self.buffer = buffer
+        self.index: Dict[int, StringSegment] = {}
+        self.shared: Dict[str, StringSegment] = {}
+
+        data = bytes(buffer[DATA_OFFSET + offset:DATA_OFFSET + offset + length])
+        pos = offset
+        for raw in data.split(b'\x00'):
+            if raw:
+                name = raw.decode()
+                string_segment = self.shared.get(name)
+                if string_segment is None:
+                    string_segment = self.shared[name] = StringSegment(name)
+                self.index[pos] = string_segment
+            pos += len(raw) + 1
+
+    @classmethod
+    def from_buffer(cls, buffer) -> BINAStringTable:
+        """Locates the table through the DATA header of a whole BINA file"""
+        string_table_offset, string_table_length = struct.unpack_from('<II', buffer, 0x18)
+        return cls(buffer, string_table_offset, string_table_length)
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, offset: int) -> StringSegment:
+        string_segment = self.index.get(offset)
+        if string_segment is None:
+            """Pointer outside the table or into the middle of a name"""
+            name = read_buffer_string(self.buffer, DATA_OFFSET + offset)
+            string_segment = self.shared.get(name)
+            if string_segment is None:
+                string_segment = StringSegment(name)
+                if name is not None:
+                    self.shared[name] = string_segment
+            self.index[offset] = string_segment
+        return string_segment
+
+
+class BINARawAnchor:
+    """Pointer target inside a BINARawSegment"""
+    def __init__(self, segment: BINARawSegment, offset: int):
+        self.segment = segment
+        self.offset = offset
+
+    @property
+    def node_location(self) -> int:
+        return self.segment.node_location + self.offset
+
+
+@dataclass(eq=False)
+class BINARawSegment(BINASegment):
+    """Bytes copied through untouched from an imported file, only its pointers are relocated on export"""
+    data: bytes = field(default=b'', repr=False)
+    targets: List[Tuple[int, Union[BINASegment, BINARawAnchor]]] = field(default_factory=list, repr=False)
+
+    def anchor(self, offset: int) -> BINARawAnchor:
+        return BINARawAnchor(self, offset)
+
+    def to_bytes(self) -> BytesIO:
+        buffer = BytesIO()
+        self.clear_pointers()
+        self.pointers = list(self.targets)
+        buffer.write(self.data)
+        return buffer
+
+    def byte_size(self) -> int:
+        return len(self.data)
+
+    def layout_pointers(self):
+        self.pointers = [(self.node_location + offset, target) for offset, target in self.targets]
+
+    def pack_into(self, buffer, offset: int):
+        buffer[offset:offset + len(self.data)] = self.data
+        for location, target in self.targets:
+            struct.pack_into('<Q', buffer, offset + location, target.node_location)
+
+    def share_strings(self, string_segments: Dict[str, StringSegment]):
+        for i, (offset, target) in enumerate(self.targets):
+            if isinstance(target, StringSegment):
+                self.targets[i] = (offset, share_string(string_segments, target))
+
+
+@dataclass(eq=False)
+class BINARecordRun(BINASegment):
+    """Writes a list of BINARecords back to back as one segment, each record start stride bytes apart.
+    The last record has no trailing padding. Only string fields of the records are emitted as pointers"""
+    records: list = field(default_factory=list, repr=False)
+    record_schema: Optional[RecordSchema] = field(default=None, repr=False)
+    stride: int = field(default=0, repr=False)
+
+    def __post_init__(self):
+        if self.record_schema is None:
+            self.record_schema = type(self.records[0]).schema
+        if self.stride == 0:
+            self.stride = self.record_schema.size
+
+    def __len__(self):
+        return len(self.records)
+
+    def byte_size(self) -> int:
+        if len(self.records) == 0:
+            return 0
+        return len(self.records) * self.stride - (self.stride - self.record_schema.size)
+
+    def layout_pointers(self):
+        schema = self.record_schema
+        fields = [(schema.offsets[name], name) for name in schema.string_fields]
+        self.pointers = [(self.node_location + i * self.stride + offset, getattr(record, name))
+                         for i, record in enumerate(self.records) for offset, name in fields]
+
+    def pack_into(self, buffer, offset: int):
+        schema = self.record_schema
+        fields = [schema.indices[name] for name in schema.string_fields]
+        for i, record in enumerate(self.records):
+            values = record.pack_values()
+            for index in fields:
+                values[index] = values[index].node_location
+            schema.pack_into(buffer, offset + i * self.stride, values)
+
+    def to_bytes(self) -> BytesIO:
+        data = bytearray(self.byte_size())
+        self.pack_into(data, 0)
+        location = self.node_location
+        self.node_location = 0
+        self.layout_pointers()
+        self.node_location = location
+        return BytesIO(data)
+
+    def share_strings(self, string_segments: Dict[str, StringSegment]):
+        for record in self.records:
+            record.share_strings(string_segments)
+
+
+class SegmentRegistry(MutableSequence):
+    """Insertion ordered set of segments keyed by identity, with O(1) add, remove, contains and index.
+
+    Each segment gets a stable id when it is first added, which survives removal of other segments.
+    Removal leaves a hole that is compacted the next time positions are needed.
+    It is a mutable sequence like the lists it replaces, except that a segment can only be held once:
+    append/add of a registered segment does nothing, inserting or assigning one raises ValueError.
+    """
+    def __init__(self, segments=()):
+        self.slots: List[Optional[BINASegment]] = []
+        self.positions: Dict[int, int] = {}
+        self.ids: Dict[int, int] = {}
+        self.next_id = 0
+        self.holes = 0
+        self.extend(segments)
+
+    def add(self, segment) -> int:
+        """Adds segment if it is not registered yet, returns its stable id"""
+        key = id(segment)
+        segment_id = self.ids.get(key)
+        if segment_id is None:
+            segment_id = self.ids[key] = self.next_id
+            self.next_id += 1
+            self.positions[key] = len(self.slots)
+            self.slots.append(segment)
+        return segment_id
+
+    append = add
+
+    def extend(self, segments):
+        for segment in segments:
+            self.add(segment)
+
+    def discard(self, segment):
+        key = id(segment)
+        position = self.positions.pop(key, None)
+        if position is not None:
+            del self.ids[key]
+            self.slots[position] = None
+            self.holes += 1
+
+    def remove(self, segment):
+        if id(segment) not in self.ids:
+            raise ValueError(f"{segment!r} is not registered")
+        self.discard(segment)
+
+    def clear(self):
+        self.slots = []
+        self.positions = {}
+        self.ids = {}
+        self.holes = 0
+
+    def compact(self):
+        if self.holes:
+            self.slots = [segment for segment in self.slots if segment is not None]
+            self.reindex()
+
+    def reindex(self, start: int = 0):
+        """Recomputes positions from start on, after slots were moved"""
+        for position in range(start, len(self.slots)):
+            self.positions[id(self.slots[position])] = position
+        self.holes = 0
+
+    def require_new(self, segment):
+        if id(segment) in self.ids:
+            raise ValueError(f"{segment!r} is already registered")
+
+    def id_of(self, segment) -> int:
+        return self.ids[id(segment)]
+
+    def index(self, segment, start: int = 0, stop: Optional[int] = None) -> int:
+        self.compact()
+        position = self.positions.get(id(segment))
+        start, stop, _ = slice(start, stop).indices(len(self.slots))
+        if position is None or not start <= position < stop:
+            raise ValueError(f"{segment!r} is not registered")
+        return position
+
+    def insert(self, index: int, segment):
+        self.require_new(segment)
+        self.compact()
+        index = slice(index, None).indices(len(self.slots))[0]
+        self.slots.insert(index, segment)
+        self.ids[id(segment)] = self.next_id
+        self.next_id += 1
+        self.reindex(index)
+
+    def __setitem__(self, index, segment):
+        self.compact()
+        if isinstance(index, slice):
+            segments = list(self.slots)
+            segments[index] = segment
+            if len({id(segment) for segment in segments}) != len(segments):
+                raise ValueError("A segment can only be registered once")
+            kept = {id(segment) for segment in segments}
+            for old in self.slots:
+                if id(old) not in kept:
+                    del self.ids[id(old)]
+                    del self.positions[id(old)]
+            for new in segments:
+                if id(new) not in self.ids:
+                    self.ids[id(new)] = self.next_id
+                    self.next_id += 1
+            self.slots = segments
+            self.reindex()
+            return
+        old = self.slots[index]
+        if segment is old:
+            return
+        self.require_new(segment)
+        position = self.positions.pop(id(old))
+        del self.ids[id(old)]
+        self.slots[position] = segment
+        self.positions[id(segment)] = position
+        self.ids[id(segment)] = self.next_id
+        self.next_id += 1
+
+    def __delitem__(self, index):
+        self.compact()
+        segments = self.slots[index] if isinstance(index, slice) else [self.slots[index]]
+        for segment in segments:
+            self.discard(segment)
+
+    def reverse(self):
+        self.compact()
+        self.slots.reverse()
+        self.reindex()
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, SegmentRegistry)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __contains__(self, segment) -> bool:
+        return id(segment) in self.ids
+
+    def __len__(self) -> int:
+        return len(self.slots) - self.holes
+
+    def __getitem__(self, index):
+        self.compact()
+        return self.slots[index]
+
+    def __iter__(self):
+        return (segment for segment in self.slots if segment is not None)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self)!r})"
+
+
 @dataclass(kw_only=True, eq=False)
 class BINA:
     version: str = field(default="210", repr=False)
     string_table_offset: int = field(default=0, repr=False)
     string_table_length: int = field(default=0, repr=False)
     offset_table_length: int = field(default=0, repr=False)
-    bina_segments: List[BINASegment] = field(default_factory=list, repr=False)
+    bina_segments: SegmentRegistry = field(default_factory=SegmentRegistry, repr=False)
     string_segments: Dict[str, StringSegment] = field(default_factory=dict, repr=False)
     pointers: List[int] = field(default_factory=list, repr=False)
 
@@ -129,22 +752,15 @@ class BINA:
             if isinstance(segment, StringSegment):
                 self.add_string_segment(segment)
             else:
-                if segment not in self.bina_segments:
-                    self.bina_segments.append(segment)
+                self.bina_segments.add(segment)
 
     def clear_bina_segments(self):
-        self.bina_segments = []
+        self.bina_segments = SegmentRegistry()
 
+    @instrument.timed('add_strings_from_bina_segments', lambda self: {'strings': len(self.string_segments)})
     def add_strings_from_bina_segments(self):
         for segment in self.bina_segments:
-            if isinstance(segment.name_segment, StringSegment):
-                # self.add_string_segment(segment.name_segment)
-                """Retains ID this way instead"""
-                name = segment.name_segment.name
-                if name not in self.string_segments:
-                    self.string_segments[name] = segment.name_segment
-                else:
-                    segment.name_segment = self.string_segments[name]
+            segment.share_strings(self.string_segments)
 
     """Doesn't work as intended"""
     def add_string_segment(self, *string_segments: StringSegment):
@@ -159,6 +775,8 @@ class BINA:
     def clear_string_segments(self):
         self.string_segments = {}
 
+    @instrument.timed('write_all_segments', lambda self, bina_stream: {
+        'segments': len(self.bina_segments), 'strings': len(self.string_segments), 'string_table_bytes': self.string_table_length})
     def write_all_segments(self, bina_stream):
         for segment in self.bina_segments:
             align_bytes(bina_stream, segment.align_to)
@@ -176,6 +794,8 @@ class BINA:
 
         self.string_table_length = bina_stream.tell() - self.string_table_offset
 
+    @instrument.timed('update_segment_pointers', lambda self, bina_stream: {
+        'seeks': sum(len(segment.pointers) for segment in self.bina_segments)})
     def update_segment_pointers(self, bina_stream):
         for segment in self.bina_segments:
             for pointers in segment.pointers:
@@ -183,56 +803,74 @@ class BINA:
                 bina_stream.seek(location)
                 bina_stream.write(struct.pack('<Q', target.node_location))
 
+    @instrument.timed('write_offset_table', lambda self, bina_stream: {'bytes_written': self.offset_table_length})
     def write_offset_table(self, bina_stream):
         start = bina_stream.tell()
         offsets = []
         for segment in self.bina_segments:
             for pointer in segment.pointers:
                 offsets.append(pointer[0])
-        
-        last_offset = 0
-        offset_difs = []
-        for cur_offset in offsets:
-            dif = cur_offset - last_offset
-            last_offset = cur_offset
-            offset_difs.append(dif)
-
-        for dif in offset_difs:
-            if dif % 4:
-                raise ValueError("Offset dif must be aligned to 4 bytes")
-            
-            if dif == 0:
-                byte_len = 0
-                bits_start = '00'
-            elif dif <= 0xFC:
-                byte_len = 1
-                bits_start = '01'
-            elif dif <= 0xFFFC:
-                byte_len = 2
-                bits_start = '10'
-            elif dif <= 0xFFFFFFFC:
-                byte_len = 4
-                bits_start = '11'
-            else:
-                raise ValueError("Offset length too big")
-            
-            bits_end = "{0:b}".format(dif >> 2)
-            fill_len =  ((byte_len * 8) - 2) - len(bits_end)
-            bits_fill = "".join("0" for _ in range(fill_len))
-            entry_value = int(bits_start + bits_fill + bits_end, 2)
-            bina_stream.write(entry_value.to_bytes(byte_len, 'little'))
-
+        bina_stream.write(encode_offset_table(offsets))
         align_bytes(bina_stream, 4)
         self.offset_table_length = bina_stream.tell() - start
 
-    def export_file(self, filepath, big_endian=False):
-        tmp_buffer = BytesIO()
-        self.write_all_segments(tmp_buffer)
-        self.write_offset_table(tmp_buffer)
-        self.update_segment_pointers(tmp_buffer)
+    def plan_layout(self) -> int:
+        """Assigns every segment and string its final location in one pass, returns the end of the string table"""
+        data_end = self.plan_locations()
+        self.layout_pointers()
+        return data_end
+
+    def plan_locations(self) -> int:
+        offset = 0
+        for segment in self.bina_segments:
+            offset = align_offset(offset, segment.align_to)
+            segment.node_location = offset
+            offset += segment.byte_size()
 
-        filesize = tmp_buffer.getbuffer().nbytes + 0x40
+        offset = align_offset(offset, 4)
+        self.string_table_offset = offset
+        for string_segment in self.string_segments.values():
+            string_segment.node_location = offset
+            offset += string_segment.byte_size()
+        offset = align_offset(offset, 4)
+        self.string_table_length = offset - self.string_table_offset
+        return offset
+
+    def layout_pointers(self):
+        for segment in self.bina_segments:
+            segment.layout_pointers()
+
+    def encode_offset_table(self) -> bytes:
+        offset_table = encode_offset_table([pointer[0] for segment in self.bina_segments for pointer in segment.pointers])
+        self.offset_table_length = align_offset(len(offset_table), 4)
+        return offset_table
+
+    def pack_segments(self, buffer):
+        for segment in self.bina_segments:
+            segment.pack_into(buffer, DATA_OFFSET + segment.node_location)
+        for string_segment in self.string_segments.values():
+            string_segment.pack_into(buffer, DATA_OFFSET + string_segment.node_location)
 
+    def export_buffer(self, big_endian=False) -> bytearray:
+        """Lays out and encodes the whole file into a single preallocated buffer"""
+        with instrument.stage('layout') as stage:
+            data_end = self.plan_layout()
+            stage.add(segments=len(self.bina_segments), strings=len(self.string_segments), string_table_bytes=self.string_table_length)
+        with instrument.stage('offset_table') as stage:
+            offset_table = self.encode_offset_table()
+            stage.add(pointers=sum(len(segment.pointers) for segment in self.bina_segments) if instrument.enabled() else 0,
+                      bytes=len(offset_table))
+        filesize = DATA_OFFSET + data_end + self.offset_table_length
+
+        with instrument.stage('pack') as stage:
+            buffer = bytearray(filesize)
+            self.pack_headers(buffer, filesize, big_endian)
+            self.pack_segments(buffer)
+            buffer[DATA_OFFSET + data_end:DATA_OFFSET + data_end + len(offset_table)] = offset_table
+            stage.add(bytes=filesize)
+        return buffer
+
+    def pack_headers(self, buffer, filesize: int, big_endian=False):
         if big_endian:
             endian_id = 'B'
             esign = '>'
@@ -241,20 +879,346 @@ class BINA:
             esign = '<'
         id_string = f'BINA{self.version}{endian_id}'
 
-        with open(filepath, 'wb+') as file:            
-            # BINA Header
-            file.write(bytes(bytes(id_string, 'ascii')))
-            file.write(struct.pack(f'{esign}IHH', filesize, 1, 0))
-            align_bytes(file, 0x10)
-
-            # Data Header
-            file.write(bytes(bytes('DATA', 'ascii')))
-            file.write(struct.pack(f'{esign}I', filesize - 0x10))   # Data size
-            file.write(struct.pack(f'{esign}I', self.string_table_offset))   # String Table Offset
-            file.write(struct.pack(f'{esign}I', self.string_table_length))   # String Table Size
-            file.write(struct.pack(f'{esign}I', self.offset_table_length))   # Offset Table Size
-            file.write(struct.pack(f'{esign}H', 0x18))   # Relative Data Offset
-            align_bytes(file, 0x20)
-
-            # Data
-            file.write(tmp_buffer.getvalue())
+        # BINA Header
+        struct.pack_into(f'{esign}8sIHH', buffer, 0, bytes(id_string, 'ascii'), filesize, 1, 0)
+
+        # Data Header
+        struct.pack_into(f'{esign}4sIIIIH', buffer, 0x10, b'DATA',
+                         filesize - 0x10,                # Data size
+                         self.string_table_offset,       # String Table Offset
+                         self.string_table_length,       # String Table Size
+                         self.offset_table_length,       # Offset Table Size
+                         0x18)                           # Relative Data Offset
+
+    def export_memory(self, big_endian=False) -> memoryview:
+        """Whole file as a read-only view of the export buffer, without copying it again"""
+        return memoryview(self.export_buffer(big_endian)).toreadonly()
+
+    def export_stream(self, stream, big_endian=False) -> int:
+        """Writes the whole file to any binary stream, seekable or not. Returns the number of bytes written.
+        Non-blocking raw streams (pipes, sockets) return None from write() when full, nothing was written then,
+        so the write is retried once select() reports the stream writable again"""
+        buffer = self.export_buffer(big_endian)
+        with instrument.stage('write') as stage, memoryview(buffer) as view:
+            written = 0
+            while written < view.nbytes:
+                count = stream.write(view[written:])
+                if count is None:
+                    wait_writable(stream)
+                    continue
+                written += count
+            stage.add(bytes_written=written)
+        return written
+
+    def export_file(self, filepath, big_endian=False):
+        """filepath may also be an open binary stream"""
+        if hasattr(filepath, 'write'):
+            self.export_stream(filepath, big_endian)
+            return
+        with open(filepath, 'wb') as file:
+            self.export_stream(file, big_endian)
+
+
+def wait_writable(stream):
+    """Blocks until a non-blocking stream whose write() returned None accepts data again"""
+    try:
+        fd = stream.fileno()
+    except (AttributeError, OSError):
+        raise ValueError("Stream write() returned None and the stream has no file descriptor to wait on")
+    select.select([], [fd], [])
+
+
+def encode_offset_table(offsets: List[int]) -> bytes:
+    """Encodes ascending pointer locations as big endian deltas, with the entry size in the top two bits of the first byte"""
+    if np is not None and len(offsets) >= OFFSET_TABLE_NUMPY_MIN:
+        return encode_offset_table_array(np.asarray(offsets, dtype=np.int64))
+
+    table = bytearray()
+    last_offset = 0
+    for cur_offset in offsets:
+        dif = cur_offset - last_offset
+        last_offset = cur_offset
+        if dif % 4:
+            raise ValueError("Offset dif must be aligned to 4 bytes")
+        if dif < 0:
+            raise ValueError("Offsets must be in ascending order")
+
+        entry = dif >> 2
+        if entry == 0:
+            continue
+        elif entry <= 0x3F:
+            table.append(0x40 | entry)
+        elif entry <= 0x3FFF:
+            table += (0x8000 | entry).to_bytes(2, 'big')
+        elif entry <= 0x3FFFFFFF:
+            table += (0xC0000000 | entry).to_bytes(4, 'big')
+        else:
+            raise ValueError("Offset length too big")
+    return bytes(table)
+
+def encode_offset_table_array(offsets) -> bytes:
+    difs = np.diff(offsets, prepend=0)
+    if np.any(difs % 4):
+        raise ValueError("Offset dif must be aligned to 4 bytes")
+    if np.any(difs < 0):
+        raise ValueError("Offsets must be in ascending order")
+    entries = difs[difs > 0] >> 2
+    if np.any(entries > 0x3FFFFFFF):
+        raise ValueError("Offset length too big")
+
+    sizes = np.where(entries <= 0x3F, 1, np.where(entries <= 0x3FFF, 2, 4))
+    starts = np.cumsum(sizes) - sizes
+    table = np.zeros(int(sizes.sum()), dtype=np.uint8)
+
+    small = sizes == 1
+    table[starts[small]] = 0x40 | entries[small]
+    medium = sizes == 2
+    table[starts[medium]] = 0x80 | (entries[medium] >> 8)
+    table[starts[medium] + 1] = entries[medium] & 0xFF
+    large = sizes == 4
+    for byte in range(4):
+        table[starts[large] + byte] = (entries[large] >> (24 - 8 * byte)) & 0xFF
+    table[starts[large]] |= 0xC0
+    return table.tobytes()
+
+def check_offset_table_end(table, end: int):
+    """Entries stop at the first zero byte, everything after it must be zero padding up to 4 byte alignment"""
+    padding = len(table) - end
+    if padding > OFFSET_TABLE_MAX_PADDING:
+        raise ValueError(f"Offset table has {padding} bytes after its last entry at {hex_string(end)}, "
+                         f"expected at most {OFFSET_TABLE_MAX_PADDING} bytes of padding")
+    if any(table[end:]):
+        raise ValueError(f"Offset table padding after {hex_string(end)} is not zero")
+
+def decode_offset_table(table) -> List[int]:
+    """Decodes an offset table back into absolute pointer locations.
+    Raises ValueError for a truncated entry or anything but zero padding after the last entry"""
+    offsets = []
+    cur_offset = 0
+    pos = 0
+    table_len = len(table)
+    while pos < table_len:
+        first = table[pos]
+        tag = first & 0xC0
+        if tag == 0x40:
+            entry = first & 0x3F
+            pos += 1
+        elif tag == 0x80:
+            if pos + 2 > table_len:
+                raise ValueError("Offset table ends inside an entry")
+            entry = ((first & 0x3F) << 8) | table[pos + 1]
+            pos += 2
+        elif tag == 0xC0:
+            if pos + 4 > table_len:
+                raise ValueError("Offset table ends inside an entry")
+            entry = ((first & 0x3F) << 24) | (table[pos + 1] << 16) | (table[pos + 2] << 8) | table[pos + 3]
+            pos += 4
+        else:
+            break
+        cur_offset += entry << 2
+        offsets.append(cur_offset)
+    check_offset_table_end(table, pos)
+    return offsets
+
+def read_offset_table(buffer) -> List[int]:
+    """Pointer locations, relative to the data block, of a whole BINA file held in a bytes-like buffer"""
+    string_table_offset, string_table_length, offset_table_length = struct.unpack_from('<III', buffer, 0x18)
+    start = DATA_OFFSET + string_table_offset + string_table_length
+    return decode_offset_table(bytes(buffer[start:start + offset_table_length]))
+
+def decode_offset_table_array(table):
+    """numpy form of decode_offset_table. Only bytes tagged for two and four byte entries and the terminator
+    are stepped over in Python, every one byte entry is decoded in bulk"""
+    data = np.frombuffer(table, dtype=np.uint8)
+    tags = data >> 6
+    end = len(data)
+    wide_starts, wide_sizes = [], []
+    pos = 0
+    for start in np.flatnonzero(tags != 1).tolist():
+        if start < pos:
+            continue
+        tag = tags[start]
+        if tag == 0:
+            end = start
+            break
+        size = 2 if tag == 2 else 4
+        if start + size > len(data):
+            raise ValueError("Offset table ends inside an entry")
+        wide_starts.append(start)
+        wide_sizes.append(size)
+        pos = start + size
+    end = min(end, len(data))
+    check_offset_table_end(data, end)
+
+    sizes = np.ones(end, dtype=np.int64)
+    if wide_starts:
+        wide_starts = np.array(wide_starts, dtype=np.int64)
+        wide_sizes = np.array(wide_sizes, dtype=np.int64)
+        covered = np.zeros(end + 1, dtype=np.int64)
+        np.add.at(covered, wide_starts + 1, 1)
+        np.add.at(covered, wide_starts + wide_sizes, -1)
+        sizes[np.cumsum(covered[:end]) > 0] = 0
+        sizes[wide_starts] = wide_sizes
+    starts = np.flatnonzero(sizes)
+    sizes = sizes[starts]
+
+    padded = np.concatenate((data[:end], np.zeros(3, dtype=np.uint8))).astype(np.int64)
+    entries = padded[starts] & 0x3F
+    for byte in range(1, 4):
+        more = sizes > byte
+        entries[more] = (entries[more] << 8) | padded[starts[more] + byte]
+    return np.cumsum(entries << 2)
+
+BINA_HEADER = struct.Struct('4s3sc')
+"""signature, version, endianness; the rest of the header is read in the file's byte order"""
+
+
+class BINAReader:
+    """Whole BINA file held in a bytes-like buffer, read through its headers and tables instead of known structs.
+
+    The BINA and DATA headers are checked, the offset table is decoded, and every pointer it lists is read and
+    range checked in one pass, before any record is decoded. Offsets are relative to the data block, as stored.
+    A malformed offset table only raises with strict, otherwise it is a warning and no pointers are listed.
+    """
+    def __init__(self, buffer, validate=True, strict=False):
+        self.buffer = buffer
+        self.strict = strict
+        self.read_headers()
+        self.read_pointers()
+        self._strings: Optional[BINAStringTable] = None
+        self._pointer_set = None
+        if validate:
+            self.validate()
+
+    def read_headers(self):
+        if len(self.buffer) < DATA_OFFSET:
+            raise ValueError("File too small to hold the BINA and DATA headers")
+        signature, version, endian = BINA_HEADER.unpack_from(self.buffer, 0)
+        if signature != b'BINA':
+            raise ValueError("Missing BINA signature")
+        if endian not in (b'L', b'B'):
+            raise ValueError(f"Unknown endianness {endian!r}")
+        self.version = version.decode('ascii', 'replace')
+        self.endian = '<' if endian == b'L' else '>'
+
+        filesize, self.node_count, _ = struct.unpack_from(self.endian + 'IHH', self.buffer, 0x8)
+        if filesize != len(self.buffer):
+            raise ValueError(f"Header file size {hex_string(filesize)} does not match {hex_string(len(self.buffer))}")
+        (magic, data_size, self.string_table_offset, self.string_table_length, self.offset_table_length,
+         relative_data_offset) = struct.unpack_from(self.endian + '4sIIIIH', self.buffer, 0x10)
+        if magic != b'DATA':
+            raise ValueError("Missing DATA header")
+        if data_size != filesize - 0x10:
+            raise ValueError(f"DATA size {hex_string(data_size)} does not match the file size")
+        if 0x28 + relative_data_offset != DATA_OFFSET:
+            raise ValueError(f"Unsupported data offset {hex_string(0x28 + relative_data_offset)}")
+
+        self.data_end = self.string_table_offset
+        """Records end where the string table starts"""
+        self.offset_table_offset = self.string_table_offset + self.string_table_length
+        if DATA_OFFSET + self.offset_table_offset + self.offset_table_length > filesize:
+            raise ValueError("String and offset tables run past the end of the file")
+
+    def read_pointers(self):
+        """Decodes the offset table and reads every pointer it lists. Outside strict mode a malformed table is
+        reported as a warning and no pointers are listed, records do not need them to be read"""
+        try:
+            self.locations = self.read_locations()
+            self.targets = self.read_targets()
+        except ValueError as e:
+            if self.strict:
+                raise
+            warnings.warn(f"{e}, reading records without the offset table", stacklevel=3)
+            self.locations, self.targets = [], []
+
+    def read_locations(self):
+        if self.offset_table_length % 4:
+            raise ValueError(f"Offset table length {hex_string(self.offset_table_length)} is not 4 byte aligned")
+        if DATA_OFFSET + self.offset_table_offset + self.offset_table_length != len(self.buffer):
+            raise ValueError("String and offset tables do not end at the end of the file")
+        start = DATA_OFFSET + self.offset_table_offset
+        table = self.buffer[start:start + self.offset_table_length]
+        if np is not None and self.offset_table_length >= OFFSET_TABLE_NUMPY_MIN:
+            return decode_offset_table_array(table)
+        return decode_offset_table(bytes(table))
+
+    def read_targets(self):
+        """The value of every listed pointer, read in bulk once every location is known to be aligned and in range"""
+        locations = self.locations
+        if len(locations) and locations[-1] + 8 > self.data_end:
+            raise ValueError(f"Pointer at {hex_string(int(locations[-1]))} lies outside the data block")
+        if np is not None and isinstance(locations, np.ndarray):
+            misaligned = np.flatnonzero(locations % POINTER_ALIGN)
+            misaligned = [int(locations[i]) for i in misaligned[:1]]
+        else:
+            misaligned = [location for location in locations if location % POINTER_ALIGN][:1]
+        if misaligned:
+            raise ValueError(f"Pointer at {hex_string(misaligned[0])} is not {POINTER_ALIGN} byte aligned")
+        if np is not None and isinstance(locations, np.ndarray):
+            data = np.frombuffer(self.buffer, dtype=np.uint8, count=DATA_OFFSET + self.data_end)
+            raw = data[DATA_OFFSET + locations[:, None] + np.arange(8)]
+            return raw.view(self.endian + 'u8').ravel()
+        unpack_from = struct.Struct(self.endian + 'Q').unpack_from
+        return [unpack_from(self.buffer, DATA_OFFSET + location)[0] for location in locations]
+
+    def validate(self):
+        """Every pointer must target the data block or the string table"""
+        limit = self.string_table_offset + self.string_table_length
+        if np is not None and isinstance(self.targets, np.ndarray):
+            bad = np.flatnonzero(self.targets >= limit)
+            bad = [int(i) for i in bad[:1]]
+        else:
+            bad = [i for i, target in enumerate(self.targets) if target >= limit][:1]
+        if bad:
+            i = bad[0]
+            raise ValueError(f"Pointer at {hex_string(int(self.locations[i]))} targets {hex_string(int(self.targets[i]))}, "
+                             f"past the end of the string table at {hex_string(limit)}")
+
+    def __len__(self):
+        """Number of pointers listed in the offset table"""
+        return len(self.locations)
+
+    @property
+    def strings(self) -> BINAStringTable:
+        if self._strings is None:
+            self._strings = BINAStringTable(self.buffer, self.string_table_offset, self.string_table_length)
+        return self._strings
+
+    def is_pointer(self, location: int) -> bool:
+        if self._pointer_set is None:
+            self._pointer_set = set(self.locations.tolist() if np is not None and isinstance(self.locations, np.ndarray) else self.locations)
+        return location in self._pointer_set
+
+    def pointer(self, location: int) -> int:
+        """Target of the pointer stored at location, which must be listed in the offset table"""
+        if not self.is_pointer(location):
+            raise ValueError(f"No pointer is listed at {hex_string(location)}")
+        return struct.unpack_from(self.endian + 'Q', self.buffer, DATA_OFFSET + location)[0]
+
+    def unpack(self, schema: RecordSchema, offset: int) -> tuple:
+        """Values of one record of schema at offset, grouped as schema.unpack returns them"""
+        if offset + schema.size > self.data_end:
+            raise ValueError(f"Record at {hex_string(offset)} runs past the data block")
+        return schema.unpack_from(self.buffer, DATA_OFFSET + offset)
+
+    def iter_unpack(self, schema: RecordSchema, offset: int, count: int):
+        """count records of schema stored back to back from offset"""
+        end = offset + count * schema.size
+        if end > self.data_end:
+            raise ValueError(f"{count} records at {hex_string(offset)} run past the data block")
+        with memoryview(self.buffer) as view:
+            yield from schema.iter_unpack(view[DATA_OFFSET + offset:DATA_OFFSET + end])
+
+    def record(self, schema: RecordSchema, offset: int) -> Dict[str, object]:
+        """One record as a field name -> value dict, string fields resolved to their text"""
+        fields = dict(zip(schema.names, self.unpack(schema, offset)))
+        for name in schema.string_fields:
+            fields[name] = self.strings.get(fields[name]).name
+        return fields
+
+    def array(self, dtype, offset: int, count: int):
+        """Read-only numpy view of count records of dtype at offset"""
+        require = np.dtype(dtype)
+        if offset + count * require.itemsize > self.data_end:
+            raise ValueError(f"{count} records at {hex_string(offset)} run past the data block")
+        return np.frombuffer(self.buffer, dtype=require, count=count, offset=DATA_OFFSET + offset)
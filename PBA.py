@@ -1,15 +1,64 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Optional, Union, Tuple, List
+from typing import Optional, Union, Tuple, List, Dict, Any, ClassVar, Callable
 import struct
 import math
+import operator
+import mmap
 from io import BytesIO
+from collections.abc import Sequence
 from BINA import *
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 RMS = math.sqrt(2) / 2
 
+CLOTH_NODE_STRIDE = 0x20
+CLOTH_NODE_SIZE = 0x1C
+CLOTH_LINK_STRIDE = 0x0C
+
+if np is not None:
+    CLOTH_NODE_DTYPE = np.dtype({
+        'names': ['name_offset', 'mass', 'unknown1', 'pinned', 'child_idx', 'parent_idx', 'unknown2', 'left_idx', 'right_idx'],
+        'formats': ['<u8', '<f4', '<i2', '<i2', '<i2', '<i2', '<i4', '<i2', '<i2'],
+        'offsets': [0x0, 0x8, 0xC, 0xE, 0x10, 0x12, 0x14, 0x18, 0x1A],
+        'itemsize': CLOTH_NODE_STRIDE,
+    })
+    CLOTH_LINK_DTYPE = np.dtype({
+        'names': ['verts', 'length', 'stiffness'],
+        'formats': [('<i2', (2,)), '<f4', '<f4'],
+        'offsets': [0x0, 0x4, 0x8],
+        'itemsize': CLOTH_LINK_STRIDE,
+    })
+else:
+    CLOTH_NODE_DTYPE = None
+    CLOTH_LINK_DTYPE = None
+
+def require_numpy(feature: str):
+    if np is None:
+        raise ImportError(f"{feature} requires numpy to be installed")
+
+PBA_HEADER_SCHEMA = RecordSchema(
+    ('magic', '4s'),
+    ('has_softbody', 'i'),
+    ('name_segment', STRING),
+    ('rigidbody_count', 'I'),
+    ('constraint_count', 'I'),
+    ('rigidbody_offset', POINTER),
+    ('constraint_offset', POINTER),
+    ('softbody_count', 'I'),
+    (None, '4x'),
+    ('softbody_offset', POINTER),
+    (None, '8x'),
+)
+
 @dataclass(eq=False)
 class PBAHeader(BINASegment):
+    schema: ClassVar[RecordSchema] = PBA_HEADER_SCHEMA
+    magic: ClassVar[bytes] = b'PBA '
     name_segment: Optional[Union[str, StringSegment]]
     has_softbody: int = field(default=1, repr=False)
 
@@ -31,53 +80,49 @@ class PBAHeader(BINASegment):
     
     def from_bytes(self, bina_stream, seek_addr=None, seek_mode=0):
         super().from_bytes(bina_stream, seek_addr, seek_mode)
-        
-        magic = bina_stream.read(4).decode()
-        self.has_softbody = struct.unpack('<i', bina_stream.read(4))[0]
-        self.name_segment = StringSegment(name=seek_string(bina_stream, 8))
-
-        self.rigidbody_count, self.constraint_count = struct.unpack('<II', bina_stream.read(8))
-        self.rigidbody_offset, self.constraint_offset = struct.unpack('<QQ', bina_stream.read(16))
-
-        self.softbody_count= struct.unpack('<I', bina_stream.read(4))[0]
-        bina_stream.read(4)
-        self.softbody_offset= struct.unpack('<Q', bina_stream.read(8))[0]
-        bina_stream.read(8)
-
-    def to_bytes(self) -> BytesIO:
-        buffer = BytesIO()
-        self.clear_pointers()
-
-        buffer.write(bytes('PBA ', 'ascii'))
-        buffer.write(struct.pack('<i', self.has_softbody))
+        self.read_record(bina_stream)
 
-        self.add_pointer(buffer, self.name_segment)
-        buffer.write(struct.pack('<Q', self.name_segment.node_location))
-
-        buffer.write(struct.pack('<II', self.rigidbody_count, self.constraint_count))
+    def get_pointer_targets(self) -> List[Tuple[str, BINASegment]]:
+        targets = super().get_pointer_targets()
 
         if self.rigidbody_count > 0 and self.rigidbody_segment is not None:
-            self.add_pointer(buffer, self.rigidbody_segment)
+            targets.append(('rigidbody_offset', self.rigidbody_segment))
             self.rigidbody_offset = self.rigidbody_segment.node_location
-        buffer.write(struct.pack('<Q', self.rigidbody_offset))
 
         if self.constraint_count > 0 and self.constraint_segment is not None:
-            self.add_pointer(buffer, self.constraint_segment)
+            targets.append(('constraint_offset', self.constraint_segment))
             self.constraint_offset = self.constraint_segment.node_location
-        buffer.write(struct.pack('<Q', self.constraint_offset))
 
-        buffer.write(struct.pack('<II', self.softbody_count, 0))
-        
         if self.softbody_count > 0 and self.softbody_segment is not None:
-            self.add_pointer(buffer, self.softbody_segment)
+            targets.append(('softbody_offset', self.softbody_segment))
             self.softbody_offset = self.softbody_segment.node_location
-        buffer.write(struct.pack('<QQ', self.softbody_offset, 0))   
-                         
-        return buffer
 
+        return targets
+
+
+RIGIDBODY_SCHEMA = RecordSchema(
+    ('name_segment', STRING),
+    ('bStaticObject', '?'),
+    ('bIsBox', '?'),
+    ('unkParam1', 'b'),
+    ('unkParam2', 'b'),
+    ('shapeRadius', 'f'),
+    ('shapeHeight', 'f'),
+    ('unkParam3', 'f'),
+    ('gravityMultiplier', 'f'),
+    ('friction', 'f'),
+    ('resitution', 'f'),
+    ('linearDamping', 'f'),
+    ('angularDamping', 'f'),
+    (None, '4x'),
+    ('offsetPosition', '3f'),
+    (None, '4x'),
+    ('offsetRotation', '4f'),
+)
 
 @dataclass(eq=False)
 class PBARigidBody(BINASegment):
+    schema: ClassVar[RecordSchema] = RIGIDBODY_SCHEMA
     name_segment: Optional[Union[str, StringSegment]]
     bStaticObject: bool = field(default=False, repr=False)
     bIsBox: bool = field(default=False, repr=False)
@@ -104,37 +149,38 @@ class PBARigidBody(BINASegment):
 
     def from_bytes(self, bina_stream, seek_addr = None, seek_mode = 0):
         super().from_bytes(bina_stream, seek_addr, seek_mode)
-        self.name_segment = StringSegment(name=seek_string(bina_stream, 8))
-        self.bStaticObject, self.bIsBox = [bool(x) for x in struct.unpack('<??', bina_stream.read(2))]
-        self.unkParam1, self.unkParam2 = struct.unpack('<bb', bina_stream.read(2))
-        self.shapeRadius, self.shapeHeight, self.unkParam3, self.gravityMultiplier = struct.unpack('<ffff', bina_stream.read(16))
-        self.friction, self.resitution, self.linearDamping, self.angularDamping = struct.unpack('<ffff', bina_stream.read(16))
-        align_bytes(bina_stream, 16, write=False)
-        self.offsetPosition = struct.unpack('<fff', bina_stream.read(12))
-        align_bytes(bina_stream, 16, write=False)
-        self.offsetRotation = struct.unpack('<ffff', bina_stream.read(16))
-
-    def to_bytes(self) -> BytesIO:
-        buffer = BytesIO()
-        self.clear_pointers()
-        self.add_pointer(buffer, self.name_segment)
-        buffer.write(struct.pack('<Q', self.name_segment.node_location))
-        buffer.write(struct.pack('<??bb', self.bStaticObject, self.bIsBox, self.unkParam1, self.unkParam2))
-        buffer.write(struct.pack('<f', self.shapeRadius))
-        buffer.write(struct.pack('<f', self.shapeHeight))
-        buffer.write(struct.pack('<f', self.unkParam3))
-        buffer.write(struct.pack('<f', self.gravityMultiplier))
-        buffer.write(struct.pack('<f', self.friction))
-        buffer.write(struct.pack('<f', self.resitution))
-        buffer.write(struct.pack('<f', self.linearDamping))
-        buffer.write(struct.pack('<f', self.angularDamping))
-        buffer.write(struct.pack('<f', 0))
-        posX, posY, posZ = self.offsetPosition
-        buffer.write(struct.pack('<ffff', posX, posY, posZ, 0))
-        rotX, rotY, rotZ, rotW = self.offsetRotation
-        buffer.write(struct.pack('<ffff', rotX, rotY, rotZ, rotW))
-        return buffer
-
+        self.read_record(bina_stream)
+
+
+CONSTRAINT_LIMIT_SCHEMA = RecordSchema(
+    ('flags', 'b'),
+    ('enabledSpring', '?'),
+    (None, '2x'),
+    ('lowLimit', 'f'),
+    ('highLimit', 'f'),
+    ('springStiffness', 'f'),
+    ('springDamping', 'f'),
+)
+limit_values = operator.attrgetter(*CONSTRAINT_LIMIT_SCHEMA.names)
+
+CONSTRAINT_SCHEMA = RecordSchema(
+    ('name_segment', STRING),
+    ('unknown1', 'b'),
+    ('unknown2', 'b'),
+    ('numIterations', 'h'),
+    ('localParentBoneIndex', 'h'),
+    ('localBoneIndex', 'h'),
+    ('realParentBoneIndex', 'h'),
+    (None, '2x'),
+    ('limits', CONSTRAINT_LIMIT_SCHEMA, 6),
+    (None, '4x'),
+    ('offsetPosition1', '3f'),
+    (None, '4x'),
+    ('offsetRotation1', '4f'),
+    ('offsetPosition2', '3f'),
+    (None, '4x'),
+    ('offsetRotation2', '4f'),
+)
 
 @dataclass(eq=False)
 class PBAConstraint(BINASegment):
@@ -147,6 +193,7 @@ class PBAConstraint(BINASegment):
         springStiffness: float = field(default=0.0, repr=False)
         springDamping: float = field(default=0.0, repr=False)
     
+    schema: ClassVar[RecordSchema] = CONSTRAINT_SCHEMA
     name_segment: Optional[Union[str, StringSegment]]
     unknown1: int = field(default=1, repr=False)
     unknown2: int = field(default=1, repr=False)
@@ -159,6 +206,7 @@ class PBAConstraint(BINASegment):
     offsetRotation1: Tuple[float, float, float, float] = field(default_factory=tuple, repr=False)
     offsetPosition2: Tuple[float, float, float] = field(default_factory=tuple, repr=False)
     offsetRotation2: Tuple[float, float, float, float] = field(default_factory=tuple, repr=False)
+    encoded_limits: Optional[List[tuple]] = field(default=None, repr=False, compare=False)
 
     def __post_init__(self, **kwargs):
         super().init_require_name(**kwargs)
@@ -179,66 +227,46 @@ class PBAConstraint(BINASegment):
 
     def from_bytes(self, bina_stream, seek_addr=None, seek_mode=0):
         super().from_bytes(bina_stream, seek_addr, seek_mode)
-
-        self.name_segment = StringSegment(name=seek_string(bina_stream, 8))
-        self.unknown1, self.unknown2 = struct.unpack('<bb', bina_stream.read(2))
-        self.numIterations, self.localParentBoneIndex = struct.unpack('<hh', bina_stream.read(4))
-        self.localBoneIndex, self.realParentBoneIndex = struct.unpack('<hh', bina_stream.read(4))
-        align_bytes(bina_stream, 4, write=False)
-        self.limits = []
-        for _ in range(6):
-            limit = self.Limit()
-            limit.flags = struct.unpack('<b', bina_stream.read(1))[0]
-            limit.enabledSpring = bool(struct.unpack('<?', bina_stream.read(1))[0])
-            align_bytes(bina_stream, 4, write=False)
-            limit.lowLimit, limit.highLimit = struct.unpack('<ff', bina_stream.read(8))
-            limit.springStiffness, limit.springDamping = struct.unpack('<ff', bina_stream.read(8))
-            self.limits.append(limit)
-        align_bytes(bina_stream, 16, write=False)
-        self.offsetPosition1 = struct.unpack('<fff', bina_stream.read(12))
-        align_bytes(bina_stream, 16, write=False)
-        self.offsetRotation1 = struct.unpack('<ffff', bina_stream.read(16))
-        align_bytes(bina_stream, 16, write=False)
-        self.offsetPosition2 = struct.unpack('<fff', bina_stream.read(12))
-        align_bytes(bina_stream, 16, write=False)
-        self.offsetRotation2 = struct.unpack('<ffff', bina_stream.read(16))
-
-    def to_bytes(self) -> BytesIO:
-        buffer = BytesIO()
-        self.clear_pointers()
-        self.add_pointer(buffer, self.name_segment)
-        buffer.write(struct.pack('<Q', self.name_segment.node_location))
-        buffer.write(struct.pack('<bbh', self.unknown1, self.unknown2, self.numIterations))
-        buffer.write(struct.pack('<hhh', self.localParentBoneIndex, self.localBoneIndex, self.realParentBoneIndex))
-        align_bytes(buffer, 4)
-
-        for limit in self.limits:
-            buffer.write(struct.pack('<b?', limit.flags, limit.enabledSpring))
-            align_bytes(buffer, 4)
-            buffer.write(struct.pack('<ff', limit.lowLimit, limit.highLimit))
-            buffer.write(struct.pack('<ff', limit.springStiffness, limit.springDamping))
-        
-        align_bytes(buffer, 16)
-        posX, posY, posZ = self.offsetPosition1
-        buffer.write(struct.pack('<fff', posX, posY, posZ))
-
-        align_bytes(buffer, 16)
-        rotX, rotY, rotZ, rotW = self.offsetRotation1
-        buffer.write(struct.pack('<ffff', rotX, rotY, rotZ, rotW))
-
-        align_bytes(buffer, 16)
-        posX, posY, posZ = self.offsetPosition2
-        buffer.write(struct.pack('<fff', posX, posY, posZ))
-
-        align_bytes(buffer, 16)
-        rotX, rotY, rotZ, rotW = self.offsetRotation2
-        buffer.write(struct.pack('<ffff', rotX, rotY, rotZ, rotW))
-        align_bytes(buffer, 16)
-        return buffer
-
-
-@dataclass(eq=False)
-class PBAClothNode(BINASegment):
+        self.read_record(bina_stream)
+
+    def unpack_record(self, values, get_string):
+        super().unpack_record(values, get_string)
+        self.limits = [self.Limit(*limit) for limit in self.limits]
+
+    @property
+    def dirty(self) -> bool:
+        return super().dirty or [limit_values(limit) for limit in self.limits] != self.encoded_limits
+
+    def pack_values(self) -> list:
+        values = super().pack_values()
+        values[self.schema.indices['limits']] = [limit_values(limit) for limit in self.limits]
+        return values
+
+    def encoded_bytes(self) -> bytes:
+        # Limits are plain records, edits to them are found by comparing with the values last encoded
+        limits = [limit_values(limit) for limit in self.limits]
+        if limits != self.encoded_limits:
+            self.encoded_limits = limits
+            self.invalidate()
+        return super().encoded_bytes()
+
+
+CLOTH_NODE_SCHEMA = RecordSchema(
+    ('name_segment', STRING),
+    ('mass', 'f'),
+    ('unknown1', 'h'),
+    ('pinned', 'h'),
+    ('child_idx', 'h'),
+    ('parent_idx', 'h'),
+    ('unknown2', 'i'),
+    ('left_idx', 'h'),
+    ('right_idx', 'h'),
+)
+
+@dataclass(eq=False, slots=True)
+class PBAClothNode(BINARecord):
+    """Slotted record, a softbody's nodes are written together by one BINARecordRun"""
+    schema: ClassVar[RecordSchema] = CLOTH_NODE_SCHEMA
     name_segment: Optional[Union[str, StringSegment]]
     mass: float = field(default=0.01, repr=False)
     unknown1: int = field(default=-1, repr=False)
@@ -249,60 +277,388 @@ class PBAClothNode(BINASegment):
     left_idx: int = field(default=-1, repr=False)
     right_idx: int = field(default=-1, repr=False)
 
-    def __post_init__(self, **kwargs):
-        super().init_require_name(**kwargs)
+    def __post_init__(self):
+        self.init_require_name()
 
         if self.parent_idx == -1:
             self.pinned = True
-        
-        self.align_to = 8
-    
+
     def from_bytes(self, bina_stream, seek_addr = None, seek_mode = 0):
-        super().from_bytes(bina_stream, seek_addr, seek_mode)
+        if seek_addr is not None:
+            bina_stream.seek(seek_addr, seek_mode)
+        else:
+            align_bytes(bina_stream, 8, write=False)
+        self.read_record(bina_stream)
+
+    def unpack_record(self, values, get_string):
+        BINARecord.unpack_record(self, values, get_string)
+        self.pinned = bool(self.pinned)
+
+
+CLOTH_LINK_SCHEMA = RecordSchema(
+    ('verts', '2h'),
+    ('length', 'f'),
+    ('stiffness', 'f'),
+)
+
+@dataclass(eq=False, slots=True)
+class PBAClothLink(BINARecord):
+    """Slotted record, a softbody's links are written together by one BINARecordRun"""
+    schema: ClassVar[RecordSchema] = CLOTH_LINK_SCHEMA
+    verts: Tuple[int, int]
+    length: float = field(repr=False)
+    stiffness: float = field(default=1.0, repr=False)
+
+    def from_bytes(self, bina_stream, seek_addr = None, seek_mode = 0):
+        if seek_addr is not None:
+            bina_stream.seek(seek_addr, seek_mode)
+        else:
+            align_bytes(bina_stream, 4, write=False)
+        self.read_record(bina_stream)
+
+
+
+class PBAClothNodeView:
+    """Per-object access to one row of a PBAClothNodeTable"""
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table: PBAClothNodeTable, index: int):
+        self.table = table
+        self.index = index
+
+    def __repr__(self):
+        return f"PBAClothNode(name_segment={self.name_segment!r})"
+
+    @property
+    def name_segment(self) -> StringSegment:
+        return self.table.names[self.index]
+
+    @name_segment.setter
+    def name_segment(self, value: Union[str, StringSegment]):
+        if isinstance(value, str):
+            value = StringSegment(value)
+        self.table.names[self.index] = value
 
-        self.name_segment = StringSegment(name=seek_string(bina_stream, 8))
-        self.mass, self.unknown1 = struct.unpack('<fh', bina_stream.read(6))
-        self.pinned = bool(struct.unpack('<h', bina_stream.read(2))[0])
-        self.child_idx, self.parent_idx = struct.unpack('<hh', bina_stream.read(4))
-        self.unknown2 = struct.unpack('<i', bina_stream.read(4))[0]
-        self.left_idx, self.right_idx = struct.unpack('<hh', bina_stream.read(4))
+    @property
+    def pinned(self) -> bool:
+        return bool(self.table.nodes['pinned'][self.index])
+
+    @pinned.setter
+    def pinned(self, value: bool):
+        self.table.nodes['pinned'][self.index] = value
+
+def _table_field(name: str, cast):
+    def getter(self):
+        return cast(self.table.nodes[name][self.index])
+    def setter(self, value):
+        self.table.nodes[name][self.index] = value
+    return property(getter, setter)
+
+for _name, _cast in [('mass', float), ('unknown1', int), ('child_idx', int), ('parent_idx', int),
+                     ('unknown2', int), ('left_idx', int), ('right_idx', int)]:
+    setattr(PBAClothNodeView, _name, _table_field(_name, _cast))
+
+
+class PBAClothLinkView:
+    """Per-object access to one row of a PBAClothLinkTable"""
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table: PBAClothLinkTable, index: int):
+        self.table = table
+        self.index = index
+
+    def __repr__(self):
+        return f"PBAClothLink(verts={self.verts!r})"
+
+    @property
+    def verts(self) -> Tuple[int, int]:
+        vert1, vert2 = self.table.links['verts'][self.index]
+        return (int(vert1), int(vert2))
+
+    @verts.setter
+    def verts(self, value: Tuple[int, int]):
+        self.table.links['verts'][self.index] = value
+
+    @property
+    def length(self) -> float:
+        return float(self.table.links['length'][self.index])
+
+    @length.setter
+    def length(self, value: float):
+        self.table.links['length'][self.index] = value
+
+    @property
+    def stiffness(self) -> float:
+        return float(self.table.links['stiffness'][self.index])
+
+    @stiffness.setter
+    def stiffness(self, value: float):
+        self.table.links['stiffness'][self.index] = value
+
+
+@dataclass(eq=False)
+class PBAClothNodeTable(BINASegment):
+    """Columnar storage for a softbody's cloth nodes, written as a single segment"""
+    nodes: Any = field(default=None, repr=False)
+    names: List[StringSegment] = field(default_factory=list, repr=False)
+
+    def __post_init__(self):
+        require_numpy("PBAClothNodeTable")
+        self.align_to = 8
+        if self.nodes is None:
+            self.nodes = np.zeros(0, dtype=CLOTH_NODE_DTYPE)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __getitem__(self, index: int) -> PBAClothNodeView:
+        if index < 0:
+            index += len(self.nodes)
+        if not 0 <= index < len(self.nodes):
+            raise IndexError("cloth node index out of range")
+        return PBAClothNodeView(self, index)
+
+    def __iter__(self):
+        for i in range(len(self.nodes)):
+            yield PBAClothNodeView(self, i)
+
+    @classmethod
+    def from_nodes(cls, nodes: List[PBAClothNode]) -> PBAClothNodeTable:
+        table = cls()
+        table.extend(nodes)
+        return table
+
+    def extend(self, nodes: List[PBAClothNode]):
+        start = len(self.nodes)
+        rows = np.zeros(start + len(nodes), dtype=CLOTH_NODE_DTYPE)
+        rows[:start] = self.nodes
+        for name in CLOTH_NODE_DTYPE.names[1:]:
+            rows[name][start:] = [getattr(node, name) for node in nodes]
+        self.nodes = rows
+        self.names = self.names + [node.name_segment for node in nodes]
+
+    def from_buffer(self, buffer, offset: int, count: int, get_string: Callable[[int], StringSegment]):
+        """Fills the table from a bytes-like buffer with a single copy of the node block"""
+        self.nodes = np.zeros(count, dtype=CLOTH_NODE_DTYPE)
+        if count > 0:
+            length = count * CLOTH_NODE_STRIDE - (CLOTH_NODE_STRIDE - CLOTH_NODE_SIZE)
+            self.nodes.view(np.uint8)[:length] = np.frombuffer(buffer, dtype=np.uint8, count=length, offset=offset)
+        self.names = [get_string(name_offset) for name_offset in self.nodes['name_offset'].tolist()]
+
+    def to_nodes(self) -> List[PBAClothNode]:
+        nodes = []
+        for i, row in enumerate(self.nodes.tolist()):
+            _, mass, unknown1, pinned, child_idx, parent_idx, unknown2, left_idx, right_idx = row
+            nodes.append(PBAClothNode(self.names[i], mass, unknown1, bool(pinned), child_idx, parent_idx, unknown2, left_idx, right_idx))
+        return nodes
+
+    def from_bytes(self, bina_stream, count: int, seek_addr=None, seek_mode=0):
+        super().from_bytes(bina_stream, seek_addr, seek_mode)
+        self.nodes = np.zeros(count, dtype=CLOTH_NODE_DTYPE)
+        if count > 0:
+            raw = self.nodes.view(np.uint8)
+            raw[:count * CLOTH_NODE_STRIDE - (CLOTH_NODE_STRIDE - CLOTH_NODE_SIZE)] = np.frombuffer(
+                bina_stream.read(count * CLOTH_NODE_STRIDE - (CLOTH_NODE_STRIDE - CLOTH_NODE_SIZE)), dtype=np.uint8)
+
+        end = bina_stream.tell()
+        self.names = []
+        for name_offset in self.nodes['name_offset'].tolist():
+            bina_stream.seek(name_offset)
+            self.names.append(StringSegment(name=read_zero_term_string(bina_stream)))
+        bina_stream.seek(end)
 
     def to_bytes(self) -> BytesIO:
         buffer = BytesIO()
         self.clear_pointers()
-        self.add_pointer(buffer, self.name_segment)
-        buffer.write(struct.pack('<Q', self.name_segment.node_location))
-        buffer.write(struct.pack('<f', self.mass))
-        buffer.write(struct.pack('<hh', self.unknown1, self.pinned))
-        buffer.write(struct.pack('<hh', self.child_idx, self.parent_idx))
-        buffer.write(struct.pack('<i', self.unknown2))
-        buffer.write(struct.pack('<hh', self.left_idx, self.right_idx))
+        self.pointers = [(i * CLOTH_NODE_STRIDE, name) for i, name in enumerate(self.names)]
+        if len(self.nodes) > 0:
+            buffer.write(self.nodes.tobytes()[:-(CLOTH_NODE_STRIDE - CLOTH_NODE_SIZE)])
         return buffer
 
+    def byte_size(self) -> int:
+        if len(self.nodes) == 0:
+            return 0
+        return len(self.nodes) * CLOTH_NODE_STRIDE - (CLOTH_NODE_STRIDE - CLOTH_NODE_SIZE)
+
+    def layout_pointers(self):
+        self.pointers = [(self.node_location + i * CLOTH_NODE_STRIDE, name) for i, name in enumerate(self.names)]
+
+    def pack_into(self, buffer, offset: int):
+        if len(self.nodes) == 0:
+            return
+        self.nodes['name_offset'] = [name.node_location for name in self.names]
+        size = self.byte_size()
+        buffer[offset:offset + size] = memoryview(self.nodes.view(np.uint8)[:size])
+
+    def share_strings(self, string_segments: Dict[str, StringSegment]):
+        self.names = [share_string(string_segments, name) for name in self.names]
+
 
 @dataclass(eq=False)
-class PBAClothLink(BINASegment):
-    verts: Tuple[int, int]
-    length: float = field(repr=False)
-    stiffness: float = field(default=1.0, repr=False)
+class PBAClothLinkTable(BINASegment):
+    """Columnar storage for a softbody's cloth links, written as a single segment"""
+    links: Any = field(default=None, repr=False)
 
     def __post_init__(self):
+        require_numpy("PBAClothLinkTable")
         self.align_to = 4
+        if self.links is None:
+            self.links = np.zeros(0, dtype=CLOTH_LINK_DTYPE)
+
+    def __len__(self):
+        return len(self.links)
+
+    def __getitem__(self, index: int) -> PBAClothLinkView:
+        if index < 0:
+            index += len(self.links)
+        if not 0 <= index < len(self.links):
+            raise IndexError("cloth link index out of range")
+        return PBAClothLinkView(self, index)
+
+    def __iter__(self):
+        for i in range(len(self.links)):
+            yield PBAClothLinkView(self, i)
+
+    @classmethod
+    def from_links(cls, links: List[PBAClothLink]) -> PBAClothLinkTable:
+        table = cls()
+        table.extend(links)
+        return table
+
+    def extend(self, links: List[PBAClothLink]):
+        start = len(self.links)
+        rows = np.zeros(start + len(links), dtype=CLOTH_LINK_DTYPE)
+        rows[:start] = self.links
+        if len(links) > 0:
+            rows['verts'][start:] = [link.verts for link in links]
+            rows['length'][start:] = [link.length for link in links]
+            rows['stiffness'][start:] = [link.stiffness for link in links]
+        self.links = rows
+
+    def from_buffer(self, buffer, offset: int, count: int):
+        if count > 0:
+            self.links = np.frombuffer(buffer, dtype=CLOTH_LINK_DTYPE, count=count, offset=offset).copy()
+        else:
+            self.links = np.zeros(0, dtype=CLOTH_LINK_DTYPE)
 
-    def from_bytes(self, bina_stream, seek_addr = None, seek_mode = 0):
+    def to_links(self) -> List[PBAClothLink]:
+        return [PBAClothLink(tuple(verts.tolist()), length, stiffness) for verts, length, stiffness in self.links.tolist()]
+
+    def from_bytes(self, bina_stream, count: int, seek_addr=None, seek_mode=0):
         super().from_bytes(bina_stream, seek_addr, seek_mode)
-        self.verts = struct.unpack('<hh', bina_stream.read(4))
-        self.length, self.stiffness = struct.unpack('<ff', bina_stream.read(8))
-    
+        self.links = np.frombuffer(bina_stream.read(count * CLOTH_LINK_STRIDE), dtype=CLOTH_LINK_DTYPE).copy()
+
     def to_bytes(self) -> BytesIO:
         buffer = BytesIO()
-        buffer.write(struct.pack('<HH', self.verts[0], self.verts[1]))
-        buffer.write(struct.pack('<ff', self.length, self.stiffness))
+        buffer.write(self.links.tobytes())
         return buffer
 
+    def byte_size(self) -> int:
+        return self.links.nbytes
+
+    def layout_pointers(self):
+        self.pointers = []
+
+    def pack_into(self, buffer, offset: int):
+        buffer[offset:offset + self.links.nbytes] = memoryview(self.links.view(np.uint8))
+
+
+CLOTH_LINK_STIFFNESS = {'structural': 1.0, 'cross': 0.5, 'shear': 0.3, 'bend': 0.3}
+"""Default stiffness per generated link kind, as used by the shipped skirt cloth"""
+CLOTH_INDEX_LIMIT = 0x7FFF
+
+def cloth_grid_nodes(columns: int, rows: int, closed=False, mass=0.01) -> Any:
+    """Node table rows for columns side by side chains of rows nodes each, stored chain after chain.
+    Row 0 is pinned, left/right join neighbouring chains and wrap around when closed"""
+    index = np.arange(columns * rows).reshape(columns, rows)
+    nodes = np.zeros(columns * rows, dtype=CLOTH_NODE_DTYPE)
+    grid = nodes.reshape(columns, rows)
+    grid['mass'] = mass
+    grid['unknown1'] = -1
+    grid['unknown2'] = -1
+    grid['pinned'][:, 0] = 1
+    grid['child_idx'] = -1
+    grid['child_idx'][:, :-1] = index[:, 1:]
+    grid['parent_idx'] = -1
+    grid['parent_idx'][:, 1:] = index[:, :-1]
+    if closed:
+        grid['left_idx'] = np.roll(index, 1, axis=0)
+        grid['right_idx'] = np.roll(index, -1, axis=0)
+    else:
+        grid['left_idx'] = -1
+        grid['left_idx'][1:] = index[:-1]
+        grid['right_idx'] = -1
+        grid['right_idx'][:-1] = index[1:]
+    return nodes
+
+
+def cloth_grid_links(columns: int, rows: int, closed=False, kinds=tuple(CLOTH_LINK_STIFFNESS),
+                     spacing: Tuple[float, float] = (0.05, 0.05), stiffness: Optional[Dict[str, float]] = None) -> Any:
+    """Link table rows of a grid built by cloth_grid_nodes.
+    structural links run along each chain, cross links join neighbouring chains, shear links their diagonals
+    and bend links skip one node in either direction. spacing is (between chains, along chains)"""
+    stiffness = dict(CLOTH_LINK_STIFFNESS, **(stiffness or {}))
+    column_spacing, row_spacing = spacing
+    index = np.arange(columns * rows).reshape(columns, rows)
+    left, right = (index, np.roll(index, -1, axis=0)) if closed else (index[:-1], index[1:])
+    left2, right2 = (index, np.roll(index, -2, axis=0)) if closed else (index[:-2], index[2:])
+    diagonal = math.hypot(column_spacing, row_spacing)
+    pairs = {
+        'structural': [(index[:, :-1], index[:, 1:], row_spacing)],
+        'cross': [(left, right, column_spacing)],
+        'shear': [(left[:, :-1], right[:, 1:], diagonal), (left[:, 1:], right[:, :-1], diagonal)],
+        'bend': [(index[:, :-2], index[:, 2:], 2 * row_spacing), (left2, right2, 2 * column_spacing)],
+    }
+    verts, lengths, stiffnesses = [], [], []
+    for kind in kinds:
+        if kind not in pairs:
+            raise ValueError(f"Unknown cloth link kind '{kind}', expected one of {', '.join(pairs)}")
+        for first, second, length in pairs[kind]:
+            verts.append(np.stack((first.ravel(), second.ravel()), axis=1))
+            lengths.append(np.full(first.size, length))
+            stiffnesses.append(np.full(first.size, stiffness[kind]))
+    if not verts:
+        return np.zeros(0, dtype=CLOTH_LINK_DTYPE)
+    verts = np.concatenate(verts)
+
+    # Bend links of closed strips up to 4 chains wide meet themselves from both sides, keep the first of each pair
+    keep = np.ones(len(verts), dtype=bool)
+    if closed and columns <= 4:
+        _, first = np.unique(np.sort(verts, axis=1), axis=0, return_index=True)
+        keep[:] = False
+        keep[first] = True
+    links = np.zeros(int(keep.sum()), dtype=CLOTH_LINK_DTYPE)
+    links['verts'] = verts[keep]
+    links['length'] = np.concatenate(lengths)[keep]
+    links['stiffness'] = np.concatenate(stiffnesses)[keep]
+    return links
+
+
+SOFTBODY_SCHEMA = RecordSchema(
+    ('name_segment', STRING),
+    ('scale', 'f'),
+    ('dampingCoeff', 'f'),
+    ('dragCoeff', 'f'),
+    ('liftCoeff', 'f'),
+    ('dynamicFrictionCoeff', 'f'),
+    ('poseMatchingCoeff', 'f'),
+    ('rigidContactsCoeff', 'f'),
+    ('kineticContactsHardness', 'f'),
+    ('softContactsHardness', 'f'),
+    ('anchorsHardness', 'f'),
+    ('positionIterations', 'b'),
+    ('unknown1', 'b'),
+    ('unknown2', 'h'),
+    ('cloth_nodes_count', 'i'),
+    ('cloth_links_count', 'i'),
+    (None, '4x'),
+    ('cloth_nodes_offset', POINTER),
+    ('cloth_links_offset', POINTER),
+)
 
 @dataclass(eq=False)
 class PBASoftBody(BINASegment):
+    schema: ClassVar[RecordSchema] = SOFTBODY_SCHEMA
     name_segment: Optional[Union[str, StringSegment]]
     scale: float = field(default=0.035, repr=False)
     dampingCoeff: float = field(default=0.035, repr=False)
@@ -318,14 +674,14 @@ class PBASoftBody(BINASegment):
     unknown1: int = field(default=3, repr=False)
     unknown2: int = field(default=31, repr=False)
 
-    cloth_nodes: List[PBAClothNode] = field(default_factory=list, repr=False)
+    cloth_nodes: Union[List[PBAClothNode], PBAClothNodeTable] = field(default_factory=list, repr=False)
     cloth_nodes_count: int = field(default=0, repr=False)
-    cloth_nodes_segment: Optional[Union[None, PBAClothNode]] = field(default=None, repr=False)
+    cloth_nodes_segment: Optional[Union[BINARecordRun, PBAClothNodeTable]] = field(default=None, repr=False)
     cloth_nodes_offset: int = field(default=0, repr=False)
 
-    cloth_links: List[PBAClothLink] = field(default_factory=list, repr=False)
+    cloth_links: Union[List[PBAClothLink], PBAClothLinkTable] = field(default_factory=list, repr=False)
     cloth_links_count: int = field(default=0, repr=False)
-    cloth_links_segment: Optional[Union[None, PBAClothLink]] = field(default=None, repr=False)
+    cloth_links_segment: Optional[Union[BINARecordRun, PBAClothLinkTable]] = field(default=None, repr=False)
     cloth_links_offset: int = field(default=0, repr=False)
     
     def __post_init__(self, **kwargs):
@@ -334,56 +690,49 @@ class PBASoftBody(BINASegment):
 
     def from_bytes(self, bina_stream, seek_addr = None, seek_mode = 0):
         super().from_bytes(bina_stream, seek_addr, seek_mode)
-
-        self.name_segment = StringSegment(name=seek_string(bina_stream, 8))
-        self.scale, self.dampingCoeff = struct.unpack('<ff', bina_stream.read(8))
-        self.dragCoeff, self.liftCoeff = struct.unpack('<ff', bina_stream.read(8))
-        self.dynamicFrictionCoeff, self.poseMatchingCoeff = struct.unpack('<ff', bina_stream.read(8))
-        self.rigidContactsCoeff, self.kineticContactsHardness = struct.unpack('<ff', bina_stream.read(8))
-        self.softContactsHardness, self.anchorsHardness = struct.unpack('<ff', bina_stream.read(8))
-        self.positionIterations, self.unknown1, self.unknown2 = struct.unpack('<bbh', bina_stream.read(4))
-        self.cloth_nodes_count, self.cloth_links_count = struct.unpack('<ii', bina_stream.read(8))
-        align_bytes(bina_stream, 8, write=False)
-        self.cloth_nodes_offset, self.cloth_links_offset = struct.unpack('<QQ', bina_stream.read(16))
-
-    def to_bytes(self) -> BytesIO:
-        buffer = BytesIO()
-        self.clear_pointers()
-        self.add_pointer(buffer, self.name_segment)
-        buffer.write(struct.pack('<Q', self.name_segment.node_location))
-        buffer.write(struct.pack('<ff', self.scale, self.dampingCoeff))
-        buffer.write(struct.pack('<ff', self.dragCoeff, self.liftCoeff))
-        buffer.write(struct.pack('<ff', self.dynamicFrictionCoeff, self.poseMatchingCoeff))
-        buffer.write(struct.pack('<ff', self.rigidContactsCoeff, self.kineticContactsHardness))
-        buffer.write(struct.pack('<ff', self.softContactsHardness, self.anchorsHardness))
-        buffer.write(struct.pack('<bbh', self.positionIterations, self.unknown1, self.unknown2))
-        
-        self.cloth_nodes_count = len(self.cloth_nodes)
-        self.cloth_links_count = len(self.cloth_links)
-        buffer.write(struct.pack('<ii', self.cloth_nodes_count, self.cloth_links_count))
-        
-        align_bytes(buffer, 8)
-        
-        self.add_pointer(buffer, self.cloth_nodes_segment)
-        buffer.write(struct.pack('<Q', self.cloth_nodes_offset))
-
-        self.add_pointer(buffer, self.cloth_links_segment)
-        buffer.write(struct.pack('<Q', self.cloth_links_offset))
-        
-        return buffer
+        self.read_record(bina_stream)
+
+    def get_pointer_targets(self) -> List[Tuple[str, BINASegment]]:
+        targets = super().get_pointer_targets()
+        if self.cloth_nodes_segment is not None:
+            targets.append(('cloth_nodes_offset', self.cloth_nodes_segment))
+        if self.cloth_links_segment is not None:
+            targets.append(('cloth_links_offset', self.cloth_links_segment))
+        return targets
+
+    def pack_values(self) -> list:
+        self.update_counts()
+        return super().pack_values()
+
+    def update_counts(self):
+        """Counts follow the node and link lists, only assigned on change so the cached encoding survives"""
+        if self.cloth_nodes_count != len(self.cloth_nodes):
+            self.cloth_nodes_count = len(self.cloth_nodes)
+        if self.cloth_links_count != len(self.cloth_links):
+            self.cloth_links_count = len(self.cloth_links)
+
+    def encoded_bytes(self) -> bytes:
+        self.update_counts()
+        return super().encoded_bytes()
 
     def add_nodes(self, *nodes: PBAClothNode):
-        for node in nodes:
-            self.cloth_nodes.append(node)
+        if isinstance(self.cloth_nodes, PBAClothNodeTable):
+            self.cloth_nodes.extend(nodes)
+        else:
+            for node in nodes:
+                self.cloth_nodes.append(node)
         self.cloth_nodes_count = len(self.cloth_nodes)
-        self.cloth_nodes_segment = self.cloth_nodes[0]
+        self.cloth_nodes_segment = self.get_nodes_segment()
         self.cloth_nodes_offset = self.cloth_nodes_segment.node_location
 
     def add_links(self, *links: PBAClothLink):
-        for link in links:
-            self.cloth_links.append(link)
+        if isinstance(self.cloth_links, PBAClothLinkTable):
+            self.cloth_links.extend(links)
+        else:
+            for link in links:
+                self.cloth_links.append(link)
         self.cloth_links_count = len(self.cloth_links)
-        self.cloth_links_segment = self.cloth_links[0]
+        self.cloth_links_segment = self.get_links_segment()
         self.cloth_links_offset = self.cloth_links_segment.node_location
     
     def clear_nodes(self):
@@ -396,12 +745,100 @@ class PBASoftBody(BINASegment):
         self.cloth_links_count = 0
         self.cloth_links_segment = None
 
+    def get_nodes_segment(self) -> Optional[BINASegment]:
+        if isinstance(self.cloth_nodes, PBAClothNodeTable):
+            return self.cloth_nodes
+        if len(self.cloth_nodes) == 0:
+            return None
+        if isinstance(self.cloth_nodes_segment, BINARecordRun) and self.cloth_nodes_segment.records is self.cloth_nodes:
+            return self.cloth_nodes_segment
+        return BINARecordRun(align_to=8, records=self.cloth_nodes, record_schema=CLOTH_NODE_SCHEMA, stride=CLOTH_NODE_STRIDE)
+
+    def get_links_segment(self) -> Optional[BINASegment]:
+        if isinstance(self.cloth_links, PBAClothLinkTable):
+            return self.cloth_links
+        if len(self.cloth_links) == 0:
+            return None
+        if isinstance(self.cloth_links_segment, BINARecordRun) and self.cloth_links_segment.records is self.cloth_links:
+            return self.cloth_links_segment
+        return BINARecordRun(align_to=4, records=self.cloth_links, record_schema=CLOTH_LINK_SCHEMA)
+
+    def build_grid(self, columns: int, rows: int, closed=False, name_format="{softbody}_{column}_{row}",
+                   kinds=tuple(CLOTH_LINK_STIFFNESS), spacing: Tuple[float, float] = (0.05, 0.05),
+                   stiffness: Optional[Dict[str, float]] = None, mass=0.01, columnar=True):
+        """Replaces the cloth with columns chains of rows nodes, pinned at their first node.
+        Node fields and links are built with array operations, names are formatted per node from name_format,
+        which receives softbody, column and row, counted from 1. columnar=False builds per-object lists"""
+        require_numpy("Cloth builders")
+        if columns < 1 or rows < 1:
+            raise ValueError("A cloth grid needs at least one column and one row")
+        if columns * rows > CLOTH_INDEX_LIMIT:
+            raise ValueError(f"{columns * rows} cloth nodes do not fit 16-bit node indices")
+        if closed and columns < 3:
+            raise ValueError("A closed cloth strip needs at least 3 columns")
+
+        softbody = self.name_segment.name
+        names = StringSegment.from_names(name_format.format(softbody=softbody, column=column + 1, row=row + 1)
+                                         for column in range(columns) for row in range(rows))
+        self.cloth_nodes = PBAClothNodeTable(nodes=cloth_grid_nodes(columns, rows, closed, mass), names=names)
+        self.cloth_links = PBAClothLinkTable(links=cloth_grid_links(columns, rows, closed, kinds, spacing, stiffness))
+        if not columnar:
+            self.cloth_nodes = self.cloth_nodes.to_nodes()
+            self.cloth_links = self.cloth_links.to_links()
+        self.update_counts()
+        self.cloth_nodes_segment = self.get_nodes_segment()
+        self.cloth_links_segment = self.get_links_segment()
+
+    def build_strip(self, columns: int, rows: int, name_format="{softbody}_{column}_{row}", **kwargs):
+        """Closed band of chains whose first and last chains are neighbours, like a skirt"""
+        self.build_grid(columns, rows, True, name_format, **kwargs)
+
+    def build_chain(self, count: int, name_format="{softbody}_{row}", kinds=('structural',), **kwargs):
+        """Single chain of count nodes hanging from a pinned root"""
+        self.build_grid(1, count, False, name_format, kinds, **kwargs)
+
+    @property
+    def is_columnar(self) -> bool:
+        return isinstance(self.cloth_nodes, PBAClothNodeTable) and isinstance(self.cloth_links, PBAClothLinkTable)
+
+    def to_columnar(self):
+        """Converts cloth nodes and links to numpy-backed tables"""
+        if not isinstance(self.cloth_nodes, PBAClothNodeTable):
+            self.cloth_nodes = PBAClothNodeTable.from_nodes(self.cloth_nodes)
+        if not isinstance(self.cloth_links, PBAClothLinkTable):
+            self.cloth_links = PBAClothLinkTable.from_links(self.cloth_links)
+        self.cloth_nodes_segment = self.get_nodes_segment()
+        self.cloth_links_segment = self.get_links_segment()
+
+    def to_objects(self):
+        """Converts cloth nodes and links back to per-object lists"""
+        if isinstance(self.cloth_nodes, PBAClothNodeTable):
+            self.cloth_nodes = self.cloth_nodes.to_nodes()
+        if isinstance(self.cloth_links, PBAClothLinkTable):
+            self.cloth_links = self.cloth_links.to_links()
+        self.cloth_nodes_segment = self.get_nodes_segment()
+        self.cloth_links_segment = self.get_links_segment()
+
+def softbody_end(links_offset: int, links_count: int) -> int:
+    """Offset of the softbody following one whose links start at links_offset, it is written after its nodes and links"""
+    return align_offset(links_offset + links_count * CLOTH_LINK_STRIDE, 8)
+
+
+def read_container(buffer, strict=False) -> BINAReader:
+    """Checked BINA reader over a whole PBA file. Records are little endian only.
+    A malformed offset table is a warning unless strict, records are read without it"""
+    reader = BINAReader(buffer, strict=strict)
+    if reader.endian != '<':
+        raise ValueError("Big endian PBA files are not supported")
+    return reader
+
+
 @dataclass(eq=False)
 class PBA(BINA):
     header: Optional[Union[str, StringSegment, PBAHeader]]
-    rigidbodies: List[PBARigidBody] = field(default_factory=list, repr=False)
-    constraints: List[PBAConstraint] = field(default_factory=list, repr=False)
-    softbodies: List[PBASoftBody] = field(default_factory=list, repr=False)
+    rigidbodies: SegmentRegistry = field(default_factory=SegmentRegistry, repr=False)
+    constraints: SegmentRegistry = field(default_factory=SegmentRegistry, repr=False)
+    softbodies: SegmentRegistry = field(default_factory=SegmentRegistry, repr=False)
 
     def __post_init__(self):
         if isinstance(self.header, str):
@@ -414,9 +851,9 @@ class PBA(BINA):
             raise_input_error(self, self.header, *[str, StringSegment, PBAHeader])
 
     def add_rigidbody(self, *rigidbodies_in: PBARigidBody):
-        for rigidbody in rigidbodies_in:
-            if rigidbody not in self.rigidbodies:
-                self.rigidbodies.append(rigidbody)
+        if not isinstance(self.rigidbodies, SegmentRegistry):
+            self.rigidbodies = SegmentRegistry(self.rigidbodies)
+        self.rigidbodies.extend(rigidbodies_in)
         
         self.header.rigidbody_count = len(self.rigidbodies)
         if self.header.rigidbody_count > 0:
@@ -427,15 +864,15 @@ class PBA(BINA):
             self.header.rigidbody_segment = None
 
     def clear_rigidbodies(self):
-        self.rigidbodies = []
+        self.rigidbodies = SegmentRegistry()
         self.header.rigidbody_count = 0
         self.header.rigidbody_offset = 0
         self.header.rigidbody_segment = None
 
     def add_constraint(self, *constraints_in: PBAConstraint):
-        for constraint in constraints_in:
-            if constraint not in self.constraints:
-                self.constraints.append(constraint)
+        if not isinstance(self.constraints, SegmentRegistry):
+            self.constraints = SegmentRegistry(self.constraints)
+        self.constraints.extend(constraints_in)
 
         self.header.constraint_count = len(self.constraints)
         if self.header.constraint_count > 0:
@@ -446,15 +883,15 @@ class PBA(BINA):
             self.header.constraint_segment = None
 
     def clear_constraints(self):
-        self.constraints = []
+        self.constraints = SegmentRegistry()
         self.header.constraint_count = 0
         self.header.constraint_offset = 0
         self.header.constraint_segment = None
 
     def add_softbody(self, *softbodies_in: PBASoftBody):
-        for softbody in softbodies_in:
-            if softbody not in self.softbodies:
-                self.softbodies.append(softbody)
+        if not isinstance(self.softbodies, SegmentRegistry):
+            self.softbodies = SegmentRegistry(self.softbodies)
+        self.softbodies.extend(softbodies_in)
 
         self.header.softbody_count = len(self.softbodies)
         if self.header.softbody_count > 0:
@@ -465,11 +902,12 @@ class PBA(BINA):
             self.header.softbody_segment = None
 
     def clear_softbodies(self):
-        self.softbodies = []
+        self.softbodies = SegmentRegistry()
         self.header.softbody_count = 0
         self.header.softbody_offset = 0
         self.header.softbody_segment = None
 
+    @instrument.timed('structure_elements', lambda self: {'segments': len(self.bina_segments)})
     def structure_elements(self):
         self.clear_bina_segments()
         self.clear_string_segments()
@@ -489,67 +927,287 @@ class PBA(BINA):
 
         for i, softbody in enumerate(self.softbodies):
             self.add_bina_segment(softbody)
-
-            if softbody.cloth_nodes_count > 0:
-                softbody.cloth_nodes_segment = softbody.cloth_nodes[0]
-                for cloth_node in softbody.cloth_nodes:
-                    self.add_bina_segment(cloth_node)
-
-            if softbody.cloth_links_count > 0:
-                softbody.cloth_links_segment = softbody.cloth_links[0]
-                for cloth_link in softbody.cloth_links:
-                    self.add_bina_segment(cloth_link) 
-            
+            self.add_softbody_elements(softbody)
 
         self.add_strings_from_bina_segments()
 
-    def import_file(self, filepath):
-        bina_stream = BytesIO()
-
-        with open(filepath, 'rb') as file:
-            file.seek(0x40)
-            bina_stream.write(file.read())
-            bina_stream.seek(0)
-            
-        self.header.from_bytes(bina_stream)
-        
-        for i in range(self.header.rigidbody_count):
-            offset = self.header.rigidbody_offset + (i * 0x50)
-            rigidbody = PBARigidBody("temp")
-            rigidbody.from_bytes(bina_stream, offset)
-            self.rigidbodies.append(rigidbody)
-        
-        for i in range(self.header.constraint_count):
-            offset = self.header.constraint_offset + (i * 0xD0)
-            constraint = PBAConstraint("temp")
-            constraint.from_bytes(bina_stream, offset)
-            self.constraints.append(constraint)
-
-        # TODO: Add tracking for segment sizes when reading
-        offset = self.header.softbody_offset 
-        for i in range(self.header.softbody_count):
-            softbody = PBASoftBody("temp")
-            softbody.from_bytes(bina_stream, offset)
-            
-            bina_stream.seek(softbody.cloth_nodes_offset)
+    def add_softbody_elements(self, softbody: PBASoftBody):
+        """Nodes and links are each registered as one segment, a table or a run over the record list"""
+        if softbody.cloth_nodes_count > 0:
+            softbody.cloth_nodes_segment = softbody.get_nodes_segment()
+            self.add_bina_segment(softbody.cloth_nodes_segment)
+
+        if softbody.cloth_links_count > 0:
+            softbody.cloth_links_segment = softbody.get_links_segment()
+            self.add_bina_segment(softbody.cloth_links_segment)
+
+    @staticmethod
+    def read_softbody(buffer, offset: int, columnar: bool, get_string: Callable[[int], StringSegment]) -> PBASoftBody:
+        softbody = PBASoftBody("temp")
+        softbody.unpack_record(PBASoftBody.schema.unpack_from(buffer, DATA_OFFSET + offset), get_string)
+
+        if columnar:
+            softbody.cloth_nodes = PBAClothNodeTable()
+            softbody.cloth_nodes.from_buffer(buffer, DATA_OFFSET + softbody.cloth_nodes_offset, softbody.cloth_nodes_count, get_string)
+            softbody.cloth_links = PBAClothLinkTable()
+            softbody.cloth_links.from_buffer(buffer, DATA_OFFSET + softbody.cloth_links_offset, softbody.cloth_links_count)
+        else:
+            start = DATA_OFFSET + softbody.cloth_nodes_offset
             for j in range(softbody.cloth_nodes_count):
                 cloth_node = PBAClothNode("temp")
-                cloth_node.from_bytes(bina_stream)
+                cloth_node.unpack_record(PBAClothNode.schema.unpack_from(buffer, start + j * CLOTH_NODE_STRIDE), get_string)
                 softbody.cloth_nodes.append(cloth_node)
-            
-            bina_stream.seek(softbody.cloth_links_offset)
-            for j in range(softbody.cloth_links_count):
+
+            start = DATA_OFFSET + softbody.cloth_links_offset
+            end = start + softbody.cloth_links_count * CLOTH_LINK_STRIDE
+            for values in PBAClothLink.schema.iter_unpack(buffer[start:end]):
                 cloth_link = PBAClothLink((0,1), 1.0)   # Temp
-                cloth_link.from_bytes(bina_stream)
+                cloth_link.unpack_record(values, get_string)
                 softbody.cloth_links.append(cloth_link)
-            
-            self.softbodies.append(softbody)
-            align_bytes(bina_stream, 8)
-            offset = bina_stream.tell()
-
+        return softbody
+
+    def import_file(self, source, columnar=False):
+        """source is a file path, which is memory mapped, or a bytes-like object holding the whole file.
+        columnar=True stores cloth nodes and links as numpy tables instead of per-object lists"""
+        if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+            self.import_buffer(source, columnar)
+            return
+
+        with instrument.stage('import_file') as stage, open(source, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                self.import_buffer(buffer, columnar)
+                stage.add(bytes_read=len(buffer))
+
+    def import_buffer(self, buffer, columnar=False):
+        """Parses in place through unpack_from at absolute offsets, no part of the buffer is copied"""
+        self.read_buffer(buffer, columnar)
         self.structure_elements()
 
+    def read_buffer(self, buffer, columnar=False, reader: Optional[BINAReader] = None):
+        """Decodes every record without structuring segments for export.
+        Headers and pointers are checked by the reader before anything is decoded"""
+        if reader is None:
+            with instrument.stage('container') as stage:
+                reader = read_container(buffer)
+                stage.add(pointers=len(reader), strings=len(reader.strings.shared), string_table_bytes=reader.string_table_length)
+        get_string = reader.strings.get
+
+        self.header.unpack_record(reader.unpack(PBAHeader.schema, 0), get_string)
+
+        with instrument.stage('parse') as stage, memoryview(buffer) as view:
+            for values in reader.iter_unpack(PBARigidBody.schema, self.header.rigidbody_offset, self.header.rigidbody_count):
+                self.rigidbodies.append(PBARigidBody.decode(values, get_string))
+
+            for values in reader.iter_unpack(PBAConstraint.schema, self.header.constraint_offset, self.header.constraint_count):
+                self.constraints.append(PBAConstraint.decode(values, get_string))
+
+            # TODO: Add tracking for segment sizes when reading
+            offset = self.header.softbody_offset
+            for i in range(self.header.softbody_count):
+                softbody = self.read_softbody(view, offset, columnar, get_string)
+                self.softbodies.append(softbody)
+                offset = softbody_end(softbody.cloth_links_offset, softbody.cloth_links_count)
+            stage.add(records=len(self.rigidbodies) + len(self.constraints) + len(self.softbodies)
+                      + sum(len(softbody.cloth_nodes) + len(softbody.cloth_links) for softbody in self.softbodies))
+
 
 
 
         
+
+
+class LazyRecordList(Sequence):
+    """Sequence proxy that decodes a record the first time it is indexed and caches it"""
+    def __init__(self, count: int, decode: Callable[[int], BINASegment]):
+        self.records: List[Optional[BINASegment]] = [None] * count
+        self.decode = decode
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.records)))]
+        record = self.records[index]
+        if record is None:
+            if index < 0:
+                index += len(self.records)
+            record = self.records[index] = self.decode(index)
+        return record
+
+    def __iter__(self):
+        for i in range(len(self.records)):
+            yield self[i]
+
+    def is_decoded(self, index: int) -> bool:
+        return self.records[index] is not None
+
+    @property
+    def decoded_count(self) -> int:
+        return sum(record is not None for record in self.records)
+
+
+@dataclass(eq=False)
+class LazyPBA(PBA):
+    """PBA that only parses the header on import and decodes records when first accessed.
+    Sections that were never accessed are copied through as raw bytes on export."""
+    columnar: bool = field(default=False, repr=False)
+    buffer: Any = field(default=None, repr=False)
+    file: Any = field(default=None, repr=False)
+    softbody_offsets: List[int] = field(default_factory=list, repr=False)
+    strings: Optional[BINAStringTable] = field(default=None, repr=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.file is not None:
+            self.buffer.close()
+            self.file.close()
+            self.file = None
+        self.buffer = None
+        self.strings = None
+
+    def import_file(self, source, columnar=False):
+        """Keeps the file memory mapped until close(), bytes-like sources are referenced as is"""
+        self.close()
+        if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+            self.buffer = source
+        else:
+            self.file = open(source, 'rb')
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.columnar = columnar
+        self.import_buffer(self.buffer, columnar)
+
+    def import_buffer(self, buffer, columnar=False):
+        reader = read_container(buffer)
+        self.strings = reader.strings
+        self.header.unpack_record(reader.unpack(PBAHeader.schema, 0), self.strings.get)
+
+        self.rigidbodies = LazyRecordList(self.header.rigidbody_count, self.decode_rigidbody)
+        self.constraints = LazyRecordList(self.header.constraint_count, self.decode_constraint)
+
+        # Softbodies are variable length, so only their fixed size records are walked to find each start
+        self.softbody_offsets = []
+        offset = self.header.softbody_offset
+        indices = PBASoftBody.schema.indices
+        for i in range(self.header.softbody_count):
+            self.softbody_offsets.append(offset)
+            values = PBASoftBody.schema.unpack_from(buffer, DATA_OFFSET + offset)
+            offset = softbody_end(values[indices['cloth_links_offset']], values[indices['cloth_links_count']])
+        self.softbodies = LazyRecordList(self.header.softbody_count, self.decode_softbody)
+
+    def decode_rigidbody(self, index: int) -> PBARigidBody:
+        offset = DATA_OFFSET + self.header.rigidbody_offset + index * PBARigidBody.schema.size
+        return PBARigidBody.decode(PBARigidBody.schema.unpack_from(self.buffer, offset), self.strings.get)
+
+    def decode_constraint(self, index: int) -> PBAConstraint:
+        offset = DATA_OFFSET + self.header.constraint_offset + index * PBAConstraint.schema.size
+        return PBAConstraint.decode(PBAConstraint.schema.unpack_from(self.buffer, offset), self.strings.get)
+
+    def decode_softbody(self, index: int) -> PBASoftBody:
+        with memoryview(self.buffer) as view:
+            return self.read_softbody(view, self.softbody_offsets[index], self.columnar, self.strings.get)
+
+    def materialize(self):
+        """Decodes every record and replaces the proxies with segment registries"""
+        for attr in ('rigidbodies', 'constraints', 'softbodies'):
+            records = getattr(self, attr)
+            if isinstance(records, LazyRecordList):
+                setattr(self, attr, SegmentRegistry(records))
+
+    def add_rigidbody(self, *rigidbodies_in: PBARigidBody):
+        self.materialize()
+        super().add_rigidbody(*rigidbodies_in)
+
+    def add_constraint(self, *constraints_in: PBAConstraint):
+        self.materialize()
+        super().add_constraint(*constraints_in)
+
+    def add_softbody(self, *softbodies_in: PBASoftBody):
+        self.materialize()
+        super().add_softbody(*softbodies_in)
+
+    def raw_table(self, offset: int, count: int, schema: RecordSchema, align_to: int) -> BINARawSegment:
+        segment = BINARawSegment(align_to=align_to)
+        start = DATA_OFFSET + offset
+        segment.data = bytes(self.buffer[start:start + count * schema.size])
+        name_field = schema.offsets['name_segment']
+        for i in range(count):
+            name_offset = struct.unpack_from('<Q', segment.data, i * schema.size + name_field)[0]
+            segment.targets.append((i * schema.size + name_field, self.strings.get(name_offset)))
+        return segment
+
+    def raw_softbody(self, index: int) -> Optional[BINARawSegment]:
+        """Softbody record, nodes and links as one block, None if they are not laid out contiguously"""
+        offset = self.softbody_offsets[index]
+        values = PBASoftBody.schema.unpack_from(self.buffer, DATA_OFFSET + offset)
+        fields = dict(zip(PBASoftBody.schema.names, values))
+        nodes_count, links_count = fields['cloth_nodes_count'], fields['cloth_links_count']
+        nodes_offset, links_offset = fields['cloth_nodes_offset'], fields['cloth_links_offset']
+        nodes_end = nodes_offset + nodes_count * CLOTH_NODE_STRIDE - (CLOTH_NODE_STRIDE - CLOTH_NODE_SIZE)
+        if (nodes_count == 0 or links_count == 0
+                or nodes_offset != align_offset(offset + PBASoftBody.schema.size, 8)
+                or links_offset != align_offset(nodes_end, 4)):
+            return None
+
+        segment = BINARawSegment(align_to=8)
+        end = links_offset + links_count * CLOTH_LINK_STRIDE
+        segment.data = bytes(self.buffer[DATA_OFFSET + offset:DATA_OFFSET + end])
+        segment.targets.append((PBASoftBody.schema.offsets['name_segment'], self.strings.get(fields['name_segment'])))
+        segment.targets.append((PBASoftBody.schema.offsets['cloth_nodes_offset'], segment.anchor(nodes_offset - offset)))
+        segment.targets.append((PBASoftBody.schema.offsets['cloth_links_offset'], segment.anchor(links_offset - offset)))
+        name_field = PBAClothNode.schema.offsets['name_segment']
+        for j in range(nodes_count):
+            location = nodes_offset - offset + j * CLOTH_NODE_STRIDE + name_field
+            name_offset = struct.unpack_from('<Q', segment.data, location)[0]
+            segment.targets.append((location, self.strings.get(name_offset)))
+        return segment
+
+    @instrument.timed('structure_elements', lambda self: {'segments': len(self.bina_segments)})
+    def structure_elements(self):
+        """Records that were never decoded are copied through as raw sections"""
+        self.clear_bina_segments()
+        self.clear_string_segments()
+        self.add_bina_segment(self.header)
+
+        sections = [
+            ('rigidbodies', 'rigidbody_segment', self.header.rigidbody_offset, PBARigidBody.schema, 8),
+            ('constraints', 'constraint_segment', self.header.constraint_offset, PBAConstraint.schema, 16),
+        ]
+        for attr, segment_attr, offset, schema, align_to in sections:
+            records = getattr(self, attr)
+            if len(records) == 0:
+                continue
+            if isinstance(records, LazyRecordList) and records.decoded_count == 0:
+                segment = self.raw_table(offset, len(records), schema, align_to)
+                self.add_bina_segment(segment)
+                setattr(self.header, segment_attr, segment)
+            else:
+                for record in records:
+                    self.add_bina_segment(record)
+                setattr(self.header, segment_attr, records[0])
+
+        self.header.softbody_segment = None
+        for i in range(len(self.softbodies)):
+            segment = None
+            if isinstance(self.softbodies, LazyRecordList) and not self.softbodies.is_decoded(i):
+                segment = self.raw_softbody(i)
+            if segment is not None:
+                self.add_bina_segment(segment)
+            else:
+                softbody = self.softbodies[i]
+                segment = softbody
+                self.add_bina_segment(softbody)
+                self.add_softbody_elements(softbody)
+            if i == 0:
+                self.header.softbody_segment = segment
+
+        self.add_strings_from_bina_segments()
+
+    def export_buffer(self, big_endian=False) -> bytearray:
+        self.structure_elements()
+        return super().export_buffer(big_endian)
@@ -0,0 +1,159 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Optional, List, Tuple, Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import glob
+import mmap
+import os
+import struct
+import time
+from PBA import *
+from cache import BuildCache
+
+COMPARE_CHUNK = 0x10000
+
+@dataclass
+class ConvertResult:
+    source: str
+    output: Optional[str] = None
+    ok: bool = False
+    same: Optional[bool] = None
+    size: int = 0
+    seconds: float = 0.0
+    cached: Optional[str] = None
+    error: Optional[str] = field(default=None, repr=False)
+
+
+def find_sources(paths: List[str], pattern="*.pba") -> List[Tuple[str, str]]:
+    """Expands files, directories (searched recursively) and globs into (source, relative output name) pairs"""
+    sources = {}
+    for path in paths:
+        if os.path.isdir(path):
+            for source in glob.glob(os.path.join(path, '**', pattern), recursive=True):
+                sources.setdefault(os.path.normpath(source), os.path.relpath(source, path))
+        elif os.path.isfile(path):
+            sources.setdefault(os.path.normpath(path), os.path.basename(path))
+        else:
+            for source in glob.glob(path, recursive=True):
+                if os.path.isfile(source):
+                    sources.setdefault(os.path.normpath(source), os.path.basename(source))
+    return sorted(sources.items())
+
+
+def check_pba(buffer):
+    """Cheap structural checks before a full import"""
+    if len(buffer) < DATA_OFFSET + PBAHeader.schema.size:
+        raise ValueError("File too small to hold a PBA header")
+    if bytes(buffer[0:4]) != b'BINA' or bytes(buffer[0x10:0x14]) != b'DATA':
+        raise ValueError("Missing BINA/DATA header")
+    filesize = struct.unpack_from('<I', buffer, 0x8)[0]
+    if filesize != len(buffer):
+        raise ValueError(f"Header file size {hex_string(filesize)} does not match {hex_string(len(buffer))}")
+    if bytes(buffer[DATA_OFFSET:DATA_OFFSET + 4]) != PBAHeader.magic:
+        raise ValueError("Missing PBA magic")
+
+
+def streams_equal(stream, data, chunk_size=COMPARE_CHUNK) -> bool:
+    """Compares a binary stream against bytes-like data one chunk at a time"""
+    with memoryview(data) as view:
+        pos = 0
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return pos == view.nbytes
+            if view[pos:pos + len(chunk)] != chunk:
+                return False
+            pos += len(chunk)
+
+
+def files_equal(filepath, data, chunk_size=COMPARE_CHUNK) -> bool:
+    if os.path.getsize(filepath) != len(data):
+        return False
+    with open(filepath, 'rb') as file:
+        return streams_equal(file, data, chunk_size)
+
+
+def convert_file(source: str, output: Optional[str] = None, verify=False, columnar=False) -> ConvertResult:
+    """Imports, validates and re-exports one file. output=None only verifies, nothing is written"""
+    result = ConvertResult(source, output)
+    start = time.perf_counter()
+    try:
+        pba = PBA("temp")
+        with open(source, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                result.size = len(buffer)
+                check_pba(buffer)
+                pba.import_buffer(buffer, columnar)
+        data = pba.export_buffer()
+
+        if verify:
+            result.same = files_equal(source, data)
+        if output is not None:
+            os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+            with open(output, 'wb') as file:
+                file.write(data)
+        result.ok = True
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def run_batch(sources: List[Tuple[str, str]], output_dir: Optional[str] = None, jobs: int = 1, verify=False, columnar=False,
+              callback: Optional[Callable[[ConvertResult], None]] = None, cache: Optional[BuildCache] = None,
+              settings: Optional[dict] = None) -> List[ConvertResult]:
+    """Converts every source, a failing file is reported in its result without stopping the batch.
+    With a cache, sources whose bytes and settings are unchanged are restored or skipped instead of converted.
+    verify is part of the key and only matching outputs are stored, so a verified hit reports same=True"""
+    tasks = [(source, os.path.join(output_dir, name) if output_dir is not None else None) for source, name in sources]
+    if cache is None or output_dir is None:
+        return run_tasks(tasks, jobs, verify, columnar, callback)
+
+    if settings is None:
+        settings = {}
+    settings = dict(settings, columnar=columnar, verify=verify)
+    results = []
+    pending = []
+    keys = {}
+    for source, output in tasks:
+        start = time.perf_counter()
+        key = keys[source] = cache.key(source, settings)
+        status = cache.restore(key, output)
+        if status is None:
+            pending.append((source, output))
+            continue
+        result = ConvertResult(source, output, ok=True, same=True if verify else None, size=os.path.getsize(source), cached=status)
+        result.seconds = time.perf_counter() - start
+        results.append(result)
+        if callback is not None:
+            callback(result)
+
+    for result in run_tasks(pending, jobs, verify, columnar, callback):
+        if result.ok and result.same is not False:
+            cache.store(keys[result.source], result.output)
+        results.append(result)
+    cache.save()
+    results.sort(key=lambda result: result.source)
+    return results
+
+
+def run_tasks(tasks: List[Tuple[str, Optional[str]]], jobs: int, verify: bool, columnar: bool,
+              callback: Optional[Callable[[ConvertResult], None]]) -> List[ConvertResult]:
+    results = []
+    if jobs <= 1 or len(tasks) <= 1:
+        for source, output in tasks:
+            result = convert_file(source, output, verify, columnar)
+            results.append(result)
+            if callback is not None:
+                callback(result)
+        return results
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(convert_file, source, output, verify, columnar) for source, output in tasks]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if callback is not None:
+                callback(result)
+    results.sort(key=lambda result: result.source)
+    return results
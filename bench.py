@@ -0,0 +1,262 @@
+from __future__ import annotations
+from typing import Optional, List, Dict
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from PBA import *
+
+STAGES = ['container', 'parse', 'structure', 'layout', 'pointers', 'offset_table', 'pack']
+IMPORT_STAGES = STAGES[:3]
+EXPORT_STAGES = STAGES[3:]
+
+
+def make_synthetic(rigidbody_count: int, softbody_count: int, nodes_per_softbody: int, links_per_softbody: int, name="synthetic") -> bytearray:
+    """Builds a skeleton of the requested size and returns its exported bytes"""
+    pba = PBA(name)
+    pba.add_rigidbody(*[PBARigidBody(f"rb_{i}") for i in range(rigidbody_count)])
+    pba.add_constraint(*[PBAConstraint(f"rb_{i}", localParentBoneIndex=i - 1, localBoneIndex=i) for i in range(1, rigidbody_count)])
+
+    for i in range(softbody_count):
+        softbody = PBASoftBody(f"cloth_{i}")
+        softbody.add_nodes(*[PBAClothNode(f"cloth_{i}_node_{j}", parent_idx=j - 1) for j in range(nodes_per_softbody)])
+        softbody.add_links(*[PBAClothLink((j % nodes_per_softbody, (j + 1) % nodes_per_softbody), 0.1) for j in range(links_per_softbody)])
+        pba.add_softbody(softbody)
+
+    pba.structure_elements()
+    return pba.export_buffer()
+
+
+SYNTHETIC = {
+    'small': dict(rigidbody_count=1000, softbody_count=4, nodes_per_softbody=2500, links_per_softbody=2500),
+    'large': dict(rigidbody_count=10000, softbody_count=10, nodes_per_softbody=10000, links_per_softbody=10000),
+}
+
+
+def record_count(pba: PBA) -> int:
+    return (len(pba.rigidbodies) + len(pba.constraints) + len(pba.softbodies)
+            + sum(len(softbody.cloth_nodes) + len(softbody.cloth_links) for softbody in pba.softbodies))
+
+
+def run_stages(buffer, columnar=False) -> Dict[str, float]:
+    """Runs import and export one stage at a time, mirroring PBA.import_buffer and BINA.export_buffer"""
+    times = {}
+    clock = time.perf_counter
+
+    start = clock()
+    reader = read_container(buffer)
+    reader.strings  # built lazily, indexed here so the string table stays in this stage as in earlier reports
+    times['container'] = clock() - start
+
+    pba = PBA("temp")
+    start = clock()
+    pba.read_buffer(buffer, columnar, reader)
+    times['parse'] = clock() - start
+
+    start = clock()
+    pba.structure_elements()
+    times['structure'] = clock() - start
+
+    start = clock()
+    data_end = pba.plan_locations()
+    times['layout'] = clock() - start
+
+    start = clock()
+    pba.layout_pointers()
+    times['pointers'] = clock() - start
+
+    start = clock()
+    offset_table = pba.encode_offset_table()
+    times['offset_table'] = clock() - start
+
+    start = clock()
+    filesize = DATA_OFFSET + data_end + pba.offset_table_length
+    out = bytearray(filesize)
+    pba.pack_headers(out, filesize)
+    pba.pack_segments(out)
+    out[DATA_OFFSET + data_end:DATA_OFFSET + data_end + len(offset_table)] = offset_table
+    times['pack'] = clock() - start
+
+    times['records'] = record_count(pba)
+    return times
+
+
+def peak_memory(buffer, columnar=False) -> int:
+    tracemalloc.start()
+    try:
+        pba = PBA("temp")
+        pba.import_buffer(buffer, columnar)
+        pba.export_buffer()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def resave_time(buffer, columnar=False, repeat: int = 3) -> float:
+    """Export time after changing one rigidbody, unchanged segments reuse their cached encoding"""
+    pba = PBA("temp")
+    pba.import_buffer(buffer, columnar)
+    pba.export_buffer()
+    times = []
+    for i in range(repeat):
+        if len(pba.rigidbodies):
+            pba.rigidbodies[0].friction += 1.0
+        start = time.perf_counter()
+        pba.export_buffer()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def record_memory(count: int = 10000) -> Dict[str, float]:
+    """Bytes per record held by cloth nodes and links, as objects and (with numpy) as columnar tables"""
+    builders = {
+        'cloth_node': lambda: [PBAClothNode(f"node_{i}", parent_idx=i - 1) for i in range(count)],
+        'cloth_link': lambda: [PBAClothLink((i, i + 1), 0.1) for i in range(count)],
+    }
+    if np is not None:
+        builders['cloth_node_table'] = lambda: PBAClothNodeTable.from_nodes(builders['cloth_node']())
+        builders['cloth_link_table'] = lambda: PBAClothLinkTable.from_links(builders['cloth_link']())
+
+    result = {}
+    for name, build in builders.items():
+        tracemalloc.start()
+        try:
+            records = build()
+            result[name] = tracemalloc.get_traced_memory()[0] / count
+        finally:
+            tracemalloc.stop()
+        del records
+    return result
+
+
+def bench_buffer(name: str, buffer, repeat: int, columnar=False, memory=True) -> dict:
+    runs = [run_stages(buffer, columnar) for _ in range(repeat)]
+    stages = {stage: min(run[stage] for run in runs) for stage in STAGES}
+    import_s = sum(stages[stage] for stage in IMPORT_STAGES)
+    export_s = sum(stages[stage] for stage in EXPORT_STAGES)
+    records = runs[0]['records']
+    result = {
+        'name': name,
+        'bytes': len(buffer),
+        'records': records,
+        'stages': stages,
+        'import_s': import_s,
+        'export_s': export_s,
+        'records_per_s': records / (import_s + export_s),
+        'mb_per_s': len(buffer) / (import_s + export_s) / 1e6,
+        'resave_s': resave_time(buffer, columnar, repeat),
+    }
+    if memory:
+        result['peak_bytes'] = peak_memory(buffer, columnar)
+    return result
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(results: List[dict]) -> dict:
+    total_s = sum(result['import_s'] + result['export_s'] for result in results)
+    return {
+        'files': len(results),
+        'seconds': total_s,
+        'files_per_s': len(results) / total_s,
+        'mb_per_s': sum(result['bytes'] for result in results) / total_s / 1e6,
+        'records_per_s': sum(result['records'] for result in results) / total_s,
+        'stages': {stage: sum(result['stages'][stage] for result in results) for stage in STAGES},
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> List[str]:
+    """Stages and files that got slower than the baseline by more than threshold (0.2 = 20%)"""
+    regressions = []
+    old_results = {result['name']: result for result in baseline['results']}
+    for result in report['results']:
+        old = old_results.get(result['name'])
+        if old is None:
+            continue
+        for stage in STAGES:
+            new_s, old_s = result['stages'][stage], old['stages'].get(stage)
+            if old_s and new_s > old_s * (1 + threshold) and new_s - old_s > 1e-4:
+                regressions.append(f"{result['name']}: {stage} {old_s * 1000:.2f} ms -> {new_s * 1000:.2f} ms")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks PBA import/export over the bundled corpus and synthetic skeletons")
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "original"))
+    parser.add_argument("--synthetic", choices=['none', 'small', 'large'], default='small')
+    parser.add_argument("--repeat", type=int, default=5, help="runs per file, the fastest run of each stage is kept")
+    parser.add_argument("--columnar", action="store_true")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--json", help="write the machine-readable report here")
+    parser.add_argument("--compare", help="baseline report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    inputs = []
+    for filepath in sorted(glob.glob(os.path.join(args.corpus, "*.pba"))):
+        with open(filepath, 'rb') as file:
+            data = file.read()
+        try:
+            read_container(data)
+        except ValueError as e:
+            print(f"skip {os.path.basename(filepath)}\t{e}", file=sys.stderr)
+            continue
+        inputs.append((os.path.basename(filepath), data))
+    if args.synthetic != 'none':
+        inputs.append((f"synthetic_{args.synthetic}", make_synthetic(**SYNTHETIC[args.synthetic])))
+
+    if not args.no_memory:
+        memory = record_memory()
+        print("bytes/record  " + "  ".join(f"{name} {size:.1f}" for name, size in memory.items()))
+
+    results = []
+    for name, buffer in inputs:
+        result = bench_buffer(name, buffer, args.repeat, args.columnar, not args.no_memory)
+        results.append(result)
+        peak = f"{result['peak_bytes'] / 1e6:8.2f} MB peak" if 'peak_bytes' in result else ""
+        print(f"{name:<28}{result['bytes']:>10} B {result['records']:>8} rec  import {result['import_s'] * 1000:8.2f} ms  "
+              f"export {result['export_s'] * 1000:8.2f} ms  resave {result['resave_s'] * 1000:8.2f} ms  {result['records_per_s']:>12.0f} rec/s {peak}")
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'numpy': np.__version__ if np is not None else None,
+            'columnar': args.columnar,
+            'repeat': args.repeat,
+        },
+        'summary': summarize(results),
+        'results': results,
+    }
+    if not args.no_memory:
+        report['bytes_per_record'] = memory
+    summary = report['summary']
+    print(f"{summary['files']} files: {summary['files_per_s']:.1f} files/s, {summary['mb_per_s']:.2f} MB/s, {summary['records_per_s']:.0f} records/s")
+    print("  " + "  ".join(f"{stage} {seconds * 1000:.2f} ms" for stage, seconds in summary['stages'].items()))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(report, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
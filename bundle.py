@@ -0,0 +1,201 @@
+"""Many exported PBA files in one container, read through a single memory map.
+
+Layout:
+    header
+    blob table, one BLOB_RECORD per unique file
+    entry table, one ENTRY_RECORD per name, sorted by utf-8 name
+    names, utf-8 without terminators
+    blobs, each aligned to BUNDLE_ALIGN
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Optional, List, Tuple, Dict, Union
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+from PBA import *
+
+BUNDLE_MAGIC = b'PBAB'
+BUNDLE_VERSION = 1
+BUNDLE_ALIGN = 16
+
+BUNDLE_HEADER = struct.Struct('<4sHHII')
+"""magic, version, reserved, entry count, blob count"""
+BLOB_RECORD = struct.Struct('<QQ16s')
+"""offset, size, blake2b digest"""
+ENTRY_RECORD = struct.Struct('<IHHI')
+"""name offset, name length, reserved, blob index"""
+
+@dataclass
+class BundleEntry:
+    name: str
+    blob: int
+    offset: int
+    size: int
+    digest: bytes
+
+
+def blob_digest(data) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def build_bundle(sources: List[Tuple[str, Union[str, bytes, bytearray, memoryview]]], output) -> Tuple[int, int]:
+    """Writes (name, path or bytes) pairs as one bundle, identical files are stored once.
+    Returns (entry count, unique blob count)"""
+    names = {}
+    blobs: List[bytes] = []
+    by_digest: Dict[bytes, List[int]] = {}
+    for name, source in sources:
+        if name in names:
+            raise ValueError(f"Duplicate bundle entry '{name}'")
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            data = bytes(source)
+        else:
+            with open(source, 'rb') as file:
+                data = file.read()
+        digest = blob_digest(data)
+        for index in by_digest.get(digest, []):
+            if blobs[index] == data:
+                break
+        else:
+            index = len(blobs)
+            blobs.append(data)
+            by_digest.setdefault(digest, []).append(index)
+        names[name] = index
+
+    entries = sorted(names.items(), key=lambda entry: entry[0].encode())
+    encoded_names = [name.encode() for name, _ in entries]
+    if any(len(name) > 0xFFFF for name in encoded_names):
+        raise ValueError("Bundle entry names are limited to 65535 bytes")
+
+    names_offset = BUNDLE_HEADER.size + len(blobs) * BLOB_RECORD.size + len(entries) * ENTRY_RECORD.size
+    offset = align_offset(names_offset + sum(len(name) for name in encoded_names), BUNDLE_ALIGN)
+    blob_offsets = []
+    for data in blobs:
+        blob_offsets.append(offset)
+        offset = align_offset(offset + len(data), BUNDLE_ALIGN)
+
+    buffer = bytearray(offset)
+    BUNDLE_HEADER.pack_into(buffer, 0, BUNDLE_MAGIC, BUNDLE_VERSION, 0, len(entries), len(blobs))
+    position = BUNDLE_HEADER.size
+    for blob_offset, data in zip(blob_offsets, blobs):
+        BLOB_RECORD.pack_into(buffer, position, blob_offset, len(data), blob_digest(data))
+        position += BLOB_RECORD.size
+    name_position = names_offset
+    for (name, index), encoded in zip(entries, encoded_names):
+        ENTRY_RECORD.pack_into(buffer, position, name_position, len(encoded), 0, index)
+        buffer[name_position:name_position + len(encoded)] = encoded
+        position += ENTRY_RECORD.size
+        name_position += len(encoded)
+    for blob_offset, data in zip(blob_offsets, blobs):
+        buffer[blob_offset:blob_offset + len(data)] = data
+
+    if hasattr(output, 'write'):
+        output.write(buffer)
+    else:
+        tmp_path = f"{output}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(buffer)
+        os.replace(tmp_path, output)
+    return len(entries), len(blobs)
+
+
+class PBABundle:
+    """Read access to a bundle through one shared memory map. Members are zero-copy views of it.
+
+    Views and lazily imported members reference the map, so drop them before close()."""
+    def __init__(self, source):
+        self.file = None
+        if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+            self.buffer = source
+        else:
+            self.file = open(source, 'rb')
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.read_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.file is not None:
+            self.buffer.close()
+            self.file.close()
+            self.file = None
+
+    def read_index(self):
+        if len(self.buffer) < BUNDLE_HEADER.size:
+            raise ValueError("File too small to hold a bundle header")
+        magic, version, _, entry_count, blob_count = BUNDLE_HEADER.unpack_from(self.buffer, 0)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError("Missing PBA bundle magic")
+        if version != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported bundle version {version}")
+
+        position = BUNDLE_HEADER.size
+        self.blobs = [BLOB_RECORD.unpack_from(self.buffer, position + i * BLOB_RECORD.size) for i in range(blob_count)]
+        position += blob_count * BLOB_RECORD.size
+        self.names: List[str] = []
+        self.blob_indices: List[int] = []
+        for name_offset, name_length, _, blob in ENTRY_RECORD.iter_unpack(self.buffer[position:position + entry_count * ENTRY_RECORD.size]):
+            self.names.append(bytes(self.buffer[name_offset:name_offset + name_length]).decode())
+            self.blob_indices.append(blob)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return self.find(name) is not None
+
+    def find(self, name: str) -> Optional[int]:
+        """Position of name in the sorted index, by binary search"""
+        key = name.encode()
+        position = bisect.bisect_left(self.names, key, key=str.encode)
+        if position < len(self.names) and self.names[position] == name:
+            return position
+        return None
+
+    def entry(self, name: str) -> BundleEntry:
+        position = self.find(name)
+        if position is None:
+            raise KeyError(f"No bundle entry named '{name}'")
+        blob = self.blob_indices[position]
+        offset, size, digest = self.blobs[blob]
+        return BundleEntry(name, blob, offset, size, digest)
+
+    def entries(self) -> List[BundleEntry]:
+        return [self.entry(name) for name in self.names]
+
+    def view(self, name: str) -> memoryview:
+        entry = self.entry(name)
+        return memoryview(self.buffer)[entry.offset:entry.offset + entry.size]
+
+    def read(self, name: str) -> bytes:
+        return bytes(self.view(name))
+
+    def open(self, name: str, columnar=False, lazy=False) -> PBA:
+        """Imports a member straight from the shared map. lazy=True returns a LazyPBA that keeps referencing it"""
+        pba = LazyPBA(name) if lazy else PBA(name)
+        if lazy:
+            pba.import_file(self.view(name), columnar)
+        else:
+            with self.view(name) as view:
+                pba.import_file(view, columnar)
+        return pba
+
+    def extract(self, output_dir: str, names: Optional[List[str]] = None, extension=".pba") -> List[str]:
+        paths = []
+        for name in (names if names is not None else self.names):
+            path = os.path.join(output_dir, name + extension)
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with self.view(name) as view, open(path, 'wb') as file:
+                file.write(view)
+            paths.append(path)
+        return paths
@@ -0,0 +1,113 @@
+from __future__ import annotations
+from typing import Optional, Dict
+import hashlib
+import json
+import os
+import shutil
+import time
+
+CACHE_VERSION = 1
+"""Bump when exported bytes change for the same input and settings"""
+MANIFEST_NAME = "manifest.json"
+TOOL_FILES = ("BINA.py", "PBA.py")
+
+
+def tool_fingerprint() -> str:
+    """Hash of the exporter sources, so cached outputs expire when the tool itself changes"""
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+    root = os.path.dirname(os.path.abspath(__file__))
+    for name in TOOL_FILES:
+        with open(os.path.join(root, name), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def file_digest(filepath) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for chunk in iter(lambda: file.read(0x100000), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """Content addressed store of exported files with a JSON manifest and size based LRU eviction.
+
+    Keys hash the input bytes, the export settings (version, endianness, ...) and the exporter sources.
+    The manifest also remembers which key produced each output path, so unchanged outputs are skipped.
+    """
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fingerprint = tool_fingerprint()
+        os.makedirs(directory, exist_ok=True)
+
+        self.entries: Dict[str, dict] = {}
+        self.outputs: Dict[str, str] = {}
+        manifest_path = os.path.join(directory, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as file:
+                manifest = json.load(file)
+            if manifest.get('fingerprint') == self.fingerprint:
+                self.entries = manifest.get('entries', {})
+                self.outputs = manifest.get('outputs', {})
+
+    def key(self, source: str, settings: dict) -> str:
+        digest = hashlib.sha256(self.fingerprint.encode())
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+        digest.update(file_digest(source).encode())
+        return digest.hexdigest()
+
+    def blob_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".bin")
+
+    def restore(self, key: str, output: str) -> Optional[str]:
+        """'skipped' if output already holds this key's result, 'restored' if it was copied from the cache, else None.
+        An output is only skipped if its content digest matches, so a locally edited output is restored"""
+        entry = self.entries.get(key)
+        if entry is None or not os.path.exists(self.blob_path(key)):
+            return None
+        entry['last_used'] = time.time()
+
+        output_key = os.path.abspath(output)
+        if (self.outputs.get(output_key) == key and 'digest' in entry and os.path.exists(output)
+                and os.path.getsize(output) == entry['size'] and file_digest(output) == entry['digest']):
+            return 'skipped'
+
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        shutil.copyfile(self.blob_path(key), output)
+        self.outputs[output_key] = key
+        return 'restored'
+
+    def store(self, key: str, output: str):
+        blob_path = self.blob_path(key)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        shutil.copyfile(output, blob_path)
+        self.entries[key] = {'size': os.path.getsize(blob_path), 'digest': file_digest(blob_path), 'last_used': time.time()}
+        self.outputs[os.path.abspath(output)] = key
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry['size'] for entry in self.entries.values())
+
+    def evict(self):
+        """Drops least recently used blobs until the cache fits in max_bytes"""
+        total = self.total_bytes
+        for key in sorted(self.entries, key=lambda key: self.entries[key]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= self.entries.pop(key)['size']
+            try:
+                os.remove(self.blob_path(key))
+            except FileNotFoundError:
+                pass
+        live = set(self.entries)
+        self.outputs = {output: key for output, key in self.outputs.items() if key in live}
+
+    def save(self):
+        self.evict()
+        manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump({'fingerprint': self.fingerprint, 'entries': self.entries, 'outputs': self.outputs}, file)
+        os.replace(tmp_path, manifest_path)
@@ -0,0 +1,209 @@
+"""Cloth node reordering for memory locality.
+
+Nodes are renumbered so that nodes joined by a link or an index field sit close together,
+links are sorted by their new vertices, and every index is rewritten with one vectorized remap.
+Parents always stay ahead of their children, so pinned roots keep their place at the head of each chain.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+import heapq
+from PBA import *
+
+NODE_INDEX_FIELDS = ('child_idx', 'parent_idx', 'left_idx', 'right_idx')
+REORDER_METHODS = ('cm', 'rcm', 'bfs')
+
+
+@dataclass
+class ReorderResult:
+    softbody: str
+    nodes: int
+    links: int
+    bandwidth_before: int
+    bandwidth_after: int
+    mean_span_before: float
+    mean_span_after: float
+    order: Any = field(default=None, repr=False)
+    """order[new index] = old index"""
+
+    def to_dict(self) -> dict:
+        return {'softbody': self.softbody, 'nodes': self.nodes, 'links': self.links,
+                'bandwidth_before': self.bandwidth_before, 'bandwidth_after': self.bandwidth_after,
+                'mean_span_before': self.mean_span_before, 'mean_span_after': self.mean_span_after}
+
+
+def node_columns(softbody: PBASoftBody) -> Dict[str, np.ndarray]:
+    """Index fields of every node as int64 arrays, sliced from the table or gathered from the objects"""
+    nodes = softbody.cloth_nodes
+    if isinstance(nodes, PBAClothNodeTable):
+        return {name: nodes.nodes[name].astype(np.int64) for name in NODE_INDEX_FIELDS}
+    return {name: np.array([getattr(node, name) for node in nodes], dtype=np.int64) for name in NODE_INDEX_FIELDS}
+
+
+def link_verts(softbody: PBASoftBody) -> np.ndarray:
+    links = softbody.cloth_links
+    if isinstance(links, PBAClothLinkTable):
+        return links.links['verts'].astype(np.int64)
+    return np.array([link.verts for link in links], dtype=np.int64).reshape(-1, 2)
+
+
+def check_indices(count: int, columns: Dict[str, np.ndarray], verts: np.ndarray):
+    for name, values in columns.items():
+        bad = (values < -1) | (values >= count)
+        if bad.any():
+            raise ValueError(f"Node {int(np.argmax(bad))} has {name} {int(values[bad][0])} outside of {count} nodes")
+    bad = (verts < 0) | (verts >= count)
+    if bad.any():
+        raise ValueError(f"Link {int(np.argmax(bad.any(axis=1)))} joins a vertex outside of {count} nodes")
+
+
+def node_edges(columns: Dict[str, np.ndarray], verts: np.ndarray) -> np.ndarray:
+    """Undirected (E, 2) edges of links and index fields, each pair once with the smaller index first"""
+    source = np.arange(len(columns['parent_idx']), dtype=np.int64)
+    edges = [verts]
+    for name in NODE_INDEX_FIELDS:
+        target = columns[name]
+        valid = target >= 0
+        edges.append(np.stack((source[valid], target[valid]), axis=1))
+    edges = np.sort(np.concatenate(edges), axis=1)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    return np.unique(edges, axis=0)
+
+
+def bandwidth(edges: np.ndarray) -> Tuple[int, float]:
+    """Largest and mean index distance across edges"""
+    if len(edges) == 0:
+        return 0, 0.0
+    spans = edges[:, 1] - edges[:, 0]
+    return int(spans.max()), float(spans.mean())
+
+
+def adjacency(count: int, edges: np.ndarray, by_degree: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR neighbour lists, each sorted by index or by (degree, index) for Cuthill-McKee"""
+    pairs = np.concatenate((edges, edges[:, ::-1]))
+    degree = np.bincount(pairs[:, 0], minlength=count)
+    keys = (pairs[:, 1], degree[pairs[:, 1]], pairs[:, 0]) if by_degree else (pairs[:, 1], pairs[:, 0])
+    pairs = pairs[np.lexsort(keys)]
+    starts = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(degree, out=starts[1:])
+    return starts, pairs[:, 1]
+
+
+def traverse(count: int, edges: np.ndarray, roots: np.ndarray, by_degree: bool) -> List[int]:
+    """Breadth-first visit order, components are entered from their pinned roots first"""
+    starts, neighbours = adjacency(count, edges, by_degree)
+    starts, neighbours = starts.tolist(), neighbours.tolist()
+    visited = [False] * count
+    order = []
+    for seed in roots.tolist() + list(range(count)):
+        if visited[seed]:
+            continue
+        visited[seed] = True
+        head = len(order)
+        order.append(seed)
+        while head < len(order):
+            node = order[head]
+            head += 1
+            for neighbour in neighbours[starts[node]:starts[node + 1]]:
+                if not visited[neighbour]:
+                    visited[neighbour] = True
+                    order.append(neighbour)
+    return order
+
+
+def parents_first(order: List[int], parents: np.ndarray) -> np.ndarray:
+    """Stable topological repair: follows order as closely as possible while emitting every parent before its children"""
+    rank = [0] * len(order)
+    for position, node in enumerate(order):
+        rank[node] = position
+    children: List[List[int]] = [[] for _ in order]
+    ready = []
+    for node, parent in enumerate(parents.tolist()):
+        if parent < 0:
+            ready.append((rank[node], node))
+        else:
+            children[parent].append(node)
+    heapq.heapify(ready)
+    result = []
+    while ready:
+        _, node = heapq.heappop(ready)
+        result.append(node)
+        for child in children[node]:
+            heapq.heappush(ready, (rank[child], child))
+    if len(result) != len(order):
+        raise ValueError("parent_idx forms a cycle")
+    return np.array(result, dtype=np.int64)
+
+
+def node_order(count: int, columns: Dict[str, np.ndarray], edges: np.ndarray, method='cm') -> np.ndarray:
+    """New node order as old indices. cm and rcm are (reverse) Cuthill-McKee, bfs keeps neighbours in index order"""
+    if method not in REORDER_METHODS:
+        raise ValueError(f"Unknown reorder method '{method}', expected one of {', '.join(REORDER_METHODS)}")
+    parents = columns['parent_idx']
+    roots = np.flatnonzero(parents < 0)
+    order = traverse(count, edges, roots, by_degree=method != 'bfs')
+    if method == 'rcm':
+        order.reverse()
+    return parents_first(order, parents)
+
+
+def apply_order(softbody: PBASoftBody, order: np.ndarray, columns: Dict[str, np.ndarray], verts: np.ndarray):
+    """Permutes nodes, remaps every index field and link, and sorts links by their new vertices.
+    Lists are permuted in place so segments built over them stay valid"""
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order), dtype=np.int64)
+    remapped = {}
+    for name, values in columns.items():
+        values = values[order]
+        remapped[name] = np.where(values >= 0, inverse[np.maximum(values, 0)], values)
+    verts = inverse[verts]
+    link_order = np.lexsort((verts.max(axis=1), verts.min(axis=1))) if len(verts) else np.zeros(0, dtype=np.int64)
+    verts = verts[link_order]
+
+    nodes = softbody.cloth_nodes
+    if isinstance(nodes, PBAClothNodeTable):
+        nodes.nodes = nodes.nodes[order]
+        nodes.names = [nodes.names[i] for i in order.tolist()]
+        for name, values in remapped.items():
+            nodes.nodes[name] = values
+    else:
+        nodes[:] = [nodes[i] for i in order.tolist()]
+        values = zip(*[remapped[name].tolist() for name in NODE_INDEX_FIELDS])
+        for node, (child_idx, parent_idx, left_idx, right_idx) in zip(nodes, values):
+            node.child_idx, node.parent_idx, node.left_idx, node.right_idx = child_idx, parent_idx, left_idx, right_idx
+
+    links = softbody.cloth_links
+    if isinstance(links, PBAClothLinkTable):
+        links.links = links.links[link_order]
+        links.links['verts'] = verts
+    else:
+        links[:] = [links[i] for i in link_order.tolist()]
+        for link, pair in zip(links, verts.tolist()):
+            link.verts = tuple(pair)
+
+
+def reorder_softbody(softbody: PBASoftBody, method='cm', only_if_better=True) -> ReorderResult:
+    """Renumbers one softbody's nodes for locality. With only_if_better, an order that would not
+    lower the bandwidth is reported but not applied"""
+    require_numpy("Cloth node reordering")
+    count = len(softbody.cloth_nodes)
+    columns = node_columns(softbody)
+    verts = link_verts(softbody)
+    check_indices(count, columns, verts)
+
+    edges = node_edges(columns, verts)
+    order = node_order(count, columns, edges, method)
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(count, dtype=np.int64)
+    before = bandwidth(edges)
+    after = bandwidth(np.sort(inverse[edges], axis=1)) if len(edges) else (0, 0.0)
+
+    result = ReorderResult(softbody.name_segment.name, count, len(verts), before[0], before[0], before[1], before[1])
+    if not only_if_better or (after[0], after[1]) < before:
+        apply_order(softbody, order, columns, verts)
+        result.bandwidth_after, result.mean_span_after, result.order = after[0], after[1], order
+    return result
+
+
+def reorder_pba(pba: PBA, method='cm', only_if_better=True) -> List[ReorderResult]:
+    return [reorder_softbody(softbody, method, only_if_better) for softbody in pba.softbodies]
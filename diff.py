@@ -0,0 +1,276 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Optional, List, Tuple, Dict, Any
+import hashlib
+import math
+import mmap
+import os
+from PBA import *
+
+REL_TOL = 1e-6
+ABS_TOL = 1e-6
+
+
+@dataclass
+class RecordDiff:
+    kind: str
+    name: str
+    status: str
+    """'added', 'removed' or 'changed'"""
+    fields: Dict[str, Tuple[Any, Any]] = field(default_factory=dict)
+
+    def __str__(self):
+        sign = {'added': '+', 'removed': '-', 'changed': '~'}[self.status]
+        line = f"{sign} {self.kind} {self.name}"
+        for name, (old, new) in self.fields.items():
+            line += f"\n    {name}: {old!r} -> {new!r}"
+        return line
+
+
+@dataclass
+class PBADiff:
+    left: Optional[str] = None
+    right: Optional[str] = None
+    records: List[RecordDiff] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list, repr=False)
+    """Sections whose bytes hashed the same and were never decoded"""
+
+    @property
+    def identical(self) -> bool:
+        return len(self.records) == 0
+
+    def counts(self) -> Dict[str, int]:
+        counts = {'added': 0, 'removed': 0, 'changed': 0}
+        for record in self.records:
+            counts[record.status] += 1
+        return counts
+
+    def to_dict(self) -> dict:
+        return {
+            'left': self.left,
+            'right': self.right,
+            'records': [{'kind': record.kind, 'name': record.name, 'status': record.status,
+                         'fields': {name: list(values) for name, values in record.fields.items()}} for record in self.records],
+        }
+
+
+def layout_fields(schema: RecordSchema) -> set:
+    """Fields that only describe where things are, which are never compared"""
+    return set(schema.pointer_fields) | set(schema.string_fields) | {name for name in schema.names if name.endswith('_count')}
+
+
+def column_kind(part: str) -> str:
+    """'f' for floats, 's' for byte strings, 'i' for everything else"""
+    return 'f' if part[-1] in 'efd' else 's' if part[-1] in 'sp' else 'i'
+
+
+def flat_columns(schema: RecordSchema, prefix="") -> List[Tuple[str, str]]:
+    """(column name, column_kind) for every flattened value of a record, matching RecordSchema.flatten"""
+    columns = []
+    for name, (_, width, sub_schema, count) in zip(schema.names, schema.groups):
+        part = schema.formats[name]
+        if sub_schema is not None:
+            for i in range(count):
+                columns.extend(flat_columns(sub_schema, f"{prefix}{name}[{i}]."))
+        elif count:
+            columns.extend((f"{prefix}{name}[{i}]", column_kind(part)) for i in range(width))
+        else:
+            columns.append((f"{prefix}{name}", column_kind(part)))
+    return columns
+
+
+class RecordComparer:
+    """Compares matched records of one schema column by column, floats within tolerance"""
+    def __init__(self, schema: RecordSchema, rel_tol: float, abs_tol: float):
+        self.schema = schema
+        self.rel_tol = rel_tol
+        self.abs_tol = abs_tol
+        columns = flat_columns(schema)
+        skipped = layout_fields(schema)
+        keep = [i for i, (name, _) in enumerate(columns) if name.split('[')[0].split('.')[0] not in skipped]
+        self.names = [columns[i][0] for i in keep]
+        self.keep = keep
+        self.is_float = [columns[i][1] == 'f' for i in keep]
+        self.is_numeric = all(columns[i][1] != 's' for i in keep)
+
+    def rows(self, records) -> list:
+        schema = self.schema
+        keep = self.keep
+        rows = []
+        for record in records:
+            flat = schema.flatten(list(schema.values_of(record)))
+            rows.append([flat[i] for i in keep])
+        return rows
+
+    def changed(self, left_rows: list, right_rows: list) -> List[Dict[str, Tuple[Any, Any]]]:
+        """Per row, the columns that differ"""
+        if len(left_rows) == 0:
+            return []
+        if np is not None and self.is_numeric:
+            left = np.array(left_rows, dtype=np.float64)
+            right = np.array(right_rows, dtype=np.float64)
+            is_float = np.array(self.is_float)
+            same = np.where(is_float, np.isclose(left, right, rtol=self.rel_tol, atol=self.abs_tol, equal_nan=True), left == right)
+            result = [{} for _ in left_rows]
+            for row, column in zip(*np.nonzero(~same)):
+                result[row][self.names[column]] = (left_rows[row][column], right_rows[row][column])
+            return result
+
+        result = []
+        for left, right in zip(left_rows, right_rows):
+            fields = {}
+            for name, is_float, old, new in zip(self.names, self.is_float, left, right):
+                if is_float:
+                    if not (math.isclose(old, new, rel_tol=self.rel_tol, abs_tol=self.abs_tol) or (math.isnan(old) and math.isnan(new))):
+                        fields[name] = (old, new)
+                elif old != new:
+                    fields[name] = (old, new)
+            result.append(fields)
+        return result
+
+
+def keyed(records, key) -> Dict[Any, Any]:
+    """Maps each record to its key, repeated keys get an occurrence number so they still pair up in order"""
+    result = {}
+    seen: Dict[Any, int] = {}
+    for record in records:
+        base = key(record)
+        occurrence = seen.get(base, 0)
+        seen[base] = occurrence + 1
+        result[(base, occurrence) if occurrence else base] = record
+    return result
+
+
+def record_name(record) -> str:
+    return record.name_segment.name
+
+
+def key_label(key) -> str:
+    if isinstance(key, tuple) and len(key) == 2 and isinstance(key[1], int):
+        return f"{key_label(key[0])}#{key[1]}"
+    if isinstance(key, tuple):
+        return "-".join(key_label(part) for part in key)
+    return str(key)
+
+
+def diff_records(kind: str, left: Dict[Any, Any], right: Dict[Any, Any], comparer: RecordComparer, prefix="") -> List[RecordDiff]:
+    """Diffs two keyed() record maps"""
+    diffs = [RecordDiff(kind, prefix + key_label(name), 'removed') for name in left if name not in right]
+    matched = [name for name in left if name in right]
+    changes = comparer.changed(comparer.rows(left[name] for name in matched), comparer.rows(right[name] for name in matched))
+    for name, fields in zip(matched, changes):
+        if fields:
+            diffs.append(RecordDiff(kind, prefix + key_label(name), 'changed', fields))
+    diffs.extend(RecordDiff(kind, prefix + key_label(name), 'added') for name in right if name not in left)
+    return diffs
+
+
+def link_key(node_names: List[str]):
+    def key(link) -> tuple:
+        vert1, vert2 = link.verts
+        return tuple(sorted((node_names[vert1] if 0 <= vert1 < len(node_names) else str(vert1),
+                             node_names[vert2] if 0 <= vert2 < len(node_names) else str(vert2))))
+    return key
+
+
+def diff_softbody(left: PBASoftBody, right: PBASoftBody, comparers: Dict[str, RecordComparer]) -> List[RecordDiff]:
+    name = left.name_segment.name
+    diffs = diff_records('softbody', {name: left}, {name: right}, comparers['softbody'])
+    diffs.extend(diff_records('cloth_node', keyed(left.cloth_nodes, record_name), keyed(right.cloth_nodes, record_name),
+                              comparers['cloth_node'], f"{name}/"))
+    # Links have no names of their own, so they are matched by the names of the nodes they join
+    left_names = [record_name(node) for node in left.cloth_nodes]
+    right_names = [record_name(node) for node in right.cloth_nodes]
+    diffs.extend(diff_records('cloth_link', keyed(left.cloth_links, link_key(left_names)), keyed(right.cloth_links, link_key(right_names)),
+                              comparers['cloth_link'], f"{name}/"))
+    return diffs
+
+
+def make_comparers(rel_tol: float, abs_tol: float) -> Dict[str, RecordComparer]:
+    return {
+        'header': RecordComparer(PBAHeader.schema, rel_tol, abs_tol),
+        'rigidbody': RecordComparer(PBARigidBody.schema, rel_tol, abs_tol),
+        'constraint': RecordComparer(PBAConstraint.schema, rel_tol, abs_tol),
+        'softbody': RecordComparer(PBASoftBody.schema, rel_tol, abs_tol),
+        'cloth_node': RecordComparer(PBAClothNode.schema, rel_tol, abs_tol),
+        'cloth_link': RecordComparer(PBAClothLink.schema, rel_tol, abs_tol),
+    }
+
+
+def section_digests(pba: LazyPBA) -> Dict[str, bytes]:
+    """Digest of the raw bytes of every section. Pointers inside are absolute, so equal digests only mean
+    equal records when the string tables are equal too, which 'strings' covers"""
+    buffer = pba.buffer
+    def digest(start: int, end: int) -> bytes:
+        return hashlib.blake2b(buffer[DATA_OFFSET + start:DATA_OFFSET + end], digest_size=16).digest()
+
+    header = pba.header
+    string_table_offset, string_table_length = struct.unpack_from('<II', buffer, 0x18)
+    digests = {
+        'strings': hashlib.blake2b(struct.pack('<I', string_table_offset)
+                                   + buffer[DATA_OFFSET + string_table_offset:DATA_OFFSET + string_table_offset + string_table_length],
+                                   digest_size=16).digest(),
+        'rigidbodies': digest(header.rigidbody_offset, header.rigidbody_offset + header.rigidbody_count * PBARigidBody.schema.size),
+        'constraints': digest(header.constraint_offset, header.constraint_offset + header.constraint_count * PBAConstraint.schema.size),
+    }
+    for i, offset in enumerate(pba.softbody_offsets):
+        values = PBASoftBody.schema.unpack_from(buffer, DATA_OFFSET + offset)
+        links_offset = values[PBASoftBody.schema.indices['cloth_links_offset']]
+        links_count = values[PBASoftBody.schema.indices['cloth_links_count']]
+        digests[f"softbody:{i}"] = digest(offset, max(links_offset + links_count * CLOTH_LINK_STRIDE, offset + PBASoftBody.schema.size))
+    return digests
+
+
+def diff_pba(left: PBA, right: PBA, rel_tol=REL_TOL, abs_tol=ABS_TOL, result: Optional[PBADiff] = None) -> PBADiff:
+    """Structural diff of two parsed files. Sections of two LazyPBAs with identical bytes are skipped undecoded"""
+    if result is None:
+        result = PBADiff()
+    comparers = make_comparers(rel_tol, abs_tol)
+    same = set()
+    if isinstance(left, LazyPBA) and isinstance(right, LazyPBA) and left.buffer is not None and right.buffer is not None:
+        left_digests = section_digests(left)
+        right_digests = section_digests(right)
+        if left_digests['strings'] == right_digests['strings']:
+            same = {section for section, digest in left_digests.items() if right_digests.get(section) == digest}
+        result.skipped = sorted(same - {'strings'})
+
+    result.records.extend(diff_records('header', {'header': left.header}, {'header': right.header}, comparers['header']))
+    if 'rigidbodies' not in same:
+        result.records.extend(diff_records('rigidbody', keyed(left.rigidbodies, record_name), keyed(right.rigidbodies, record_name),
+                                           comparers['rigidbody']))
+    if 'constraints' not in same:
+        result.records.extend(diff_records('constraint', keyed(left.constraints, record_name), keyed(right.constraints, record_name),
+                                           comparers['constraint']))
+
+    # Softbodies pair up by name, a softbody at the same index with identical bytes is never decoded
+    pending_left = [i for i in range(len(left.softbodies)) if f"softbody:{i}" not in same]
+    pending_right = [i for i in range(len(right.softbodies)) if f"softbody:{i}" not in same]
+    left_softbodies = keyed([left.softbodies[i] for i in pending_left], record_name)
+    right_softbodies = keyed([right.softbodies[i] for i in pending_right], record_name)
+    for name, softbody in left_softbodies.items():
+        if name not in right_softbodies:
+            result.records.append(RecordDiff('softbody', key_label(name), 'removed'))
+        else:
+            result.records.extend(diff_softbody(softbody, right_softbodies[name], comparers))
+    result.records.extend(RecordDiff('softbody', key_label(name), 'added') for name in right_softbodies if name not in left_softbodies)
+    return result
+
+
+def diff_files(left_path, right_path, rel_tol=REL_TOL, abs_tol=ABS_TOL) -> PBADiff:
+    """Files with identical bytes return straight away, otherwise both are imported lazily and diffed"""
+    result = PBADiff(str(left_path), str(right_path))
+    if os.path.getsize(left_path) == os.path.getsize(right_path):
+        with open(left_path, 'rb') as left_file, open(right_path, 'rb') as right_file:
+            if os.path.getsize(left_path) == 0:
+                return result
+            with mmap.mmap(left_file.fileno(), 0, access=mmap.ACCESS_READ) as left_buffer, \
+                    mmap.mmap(right_file.fileno(), 0, access=mmap.ACCESS_READ) as right_buffer:
+                with memoryview(left_buffer) as left_view, memoryview(right_buffer) as right_view:
+                    if left_view == right_view:
+                        result.skipped = ['file']
+                        return result
+
+    with LazyPBA("left") as left, LazyPBA("right") as right:
+        left.import_file(left_path)
+        right.import_file(right_path)
+        return diff_pba(left, right, rel_tol, abs_tol, result)
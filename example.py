@@ -18,12 +18,7 @@ pba.add_softbody(*softbodies)
 for i, softbody in enumerate(pba.softbodies):
     keys = "ABCD"
     key = keys[i]
-    soft_bone_names = [f"softbone{key}_{j+1}" for j in range(40)]
-    nodes = [PBAClothNode(name) for name in soft_bone_names]
-    softbody.add_nodes(*nodes)
-    
-    links = [PBAClothLink((j, j+1), 1.0) for j in range(86)]
-    softbody.add_links(*links)
+    softbody.build_chain(40, name_format=f"softbone{key}_{{row}}", spacing=(0.05, 1.0))
 
 pba.structure_elements()
 pba.export_file("output/custom_file.pba")
@@ -0,0 +1,111 @@
+"""Header-only inspection, reads the BINA/DATA header and the PBA header without importing the file.
+
+Only a fixed number of small reads is made per file: the headers, the name, and with softbodies=True
+one softbody record and name per softbody. Nothing is decoded past them.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Optional, List, Iterator
+import os
+import struct
+from PBA import *
+
+INFO_HEADER_SIZE = DATA_OFFSET + PBA_HEADER_SCHEMA.size
+
+
+@dataclass
+class SoftBodyInfo:
+    name: str
+    nodes: int
+    links: int
+
+
+@dataclass
+class PBAInfo:
+    path: str
+    size: int = 0
+    version: str = ""
+    endian: str = ""
+    name: Optional[str] = None
+    rigidbody_count: int = 0
+    constraint_count: int = 0
+    softbody_count: int = 0
+    softbodies: Optional[List[SoftBodyInfo]] = field(default=None, repr=False)
+    error: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> dict:
+        result = {'path': self.path, 'size': self.size, 'version': self.version, 'endian': self.endian, 'name': self.name,
+                  'rigidbody_count': self.rigidbody_count, 'constraint_count': self.constraint_count,
+                  'softbody_count': self.softbody_count}
+        if self.softbodies is not None:
+            result['softbodies'] = [{'name': softbody.name, 'nodes': softbody.nodes, 'links': softbody.links}
+                                    for softbody in self.softbodies]
+        if self.error is not None:
+            result['error'] = self.error
+        return result
+
+
+def read_headers(file, size: int, info: PBAInfo) -> tuple:
+    """Checks the BINA/DATA header and returns the unpacked PBA header values"""
+    data = file.read(INFO_HEADER_SIZE)
+    if len(data) < INFO_HEADER_SIZE:
+        raise ValueError("File too small to hold a PBA header")
+    if data[0:4] != b'BINA' or data[0x10:0x14] != b'DATA':
+        raise ValueError("Missing BINA/DATA header")
+    info.version = data[4:7].decode('ascii', 'replace')
+    info.endian = chr(data[7])
+    if info.endian != 'L':
+        raise ValueError(f"Unsupported endianness '{info.endian}'")
+    filesize = struct.unpack_from('<I', data, 0x8)[0]
+    if filesize != size:
+        raise ValueError(f"Header file size {hex_string(filesize)} does not match {hex_string(size)}")
+    if data[DATA_OFFSET:DATA_OFFSET + 4] != PBAHeader.magic:
+        raise ValueError("Missing PBA magic")
+    return PBA_HEADER_SCHEMA.unpack_from(data, DATA_OFFSET)
+
+
+def read_softbody_infos(file, offset: int, count: int) -> List[SoftBodyInfo]:
+    """Walks the softbody records, each one follows the nodes and links of the one before it"""
+    schema = PBASoftBody.schema
+    indices = schema.indices
+    softbodies = []
+    for _ in range(count):
+        file.seek(DATA_OFFSET + offset)
+        data = file.read(schema.size)
+        if len(data) < schema.size:
+            raise ValueError(f"Softbody record at {hex_string(DATA_OFFSET + offset)} runs past the end of the file")
+        values = schema.unpack(data)
+        name = read_string_at(file, DATA_OFFSET + values[indices['name_segment']])
+        softbodies.append(SoftBodyInfo(name, values[indices['cloth_nodes_count']], values[indices['cloth_links_count']]))
+        offset = softbody_end(values[indices['cloth_links_offset']], values[indices['cloth_links_count']])
+    return softbodies
+
+
+def read_info(source: str, softbodies=False) -> PBAInfo:
+    """Name and record counts of one file, plus per-softbody node and link counts with softbodies=True.
+    A file that fails the header checks is reported in error instead of raising"""
+    info = PBAInfo(source)
+    try:
+        with open(source, 'rb') as file:
+            info.size = os.fstat(file.fileno()).st_size
+            values = read_headers(file, info.size, info)
+            indices = PBA_HEADER_SCHEMA.indices
+            info.name = read_string_at(file, DATA_OFFSET + values[indices['name_segment']])
+            info.rigidbody_count = values[indices['rigidbody_count']]
+            info.constraint_count = values[indices['constraint_count']]
+            info.softbody_count = values[indices['softbody_count']]
+            if softbodies:
+                info.softbodies = read_softbody_infos(file, values[indices['softbody_offset']], info.softbody_count)
+    except (OSError, ValueError, struct.error, UnicodeDecodeError) as e:
+        info.error = f"{type(e).__name__}: {e}"
+    return info
+
+
+def iter_info(sources: List[str], softbodies=False) -> Iterator[PBAInfo]:
+    """One file at a time, so memory stays constant however many files are inspected"""
+    for source in sources:
+        yield read_info(source, softbodies)
@@ -0,0 +1,169 @@
+"""Opt-in stage timing and counters for import and export.
+
+Nothing is recorded unless a sink is registered, and stage() then returns a shared no-op object,
+so the hooks left in the hot paths cost one call and one list check.
+
+    with instrumented() as stats:
+        pba.import_file("chr_sage.pba")
+        pba.export_file("out.pba")
+    print(stats.report())
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Callable
+from contextlib import contextmanager
+import functools
+import json
+import logging
+import time
+
+
+@dataclass
+class StageEvent:
+    stage: str
+    seconds: float = 0.0
+    counters: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, **counters: int):
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+
+class NullStage:
+    """Returned by stage() while disabled, accepts and drops everything"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def add(self, **counters: int):
+        pass
+
+
+NULL_STAGE = NullStage()
+SINKS: List[Callable[[StageEvent], None]] = []
+
+
+class Stage:
+    __slots__ = ('event', 'start')
+
+    def __init__(self, name: str):
+        self.event = StageEvent(name)
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.event.seconds = time.perf_counter() - self.start
+        for sink in SINKS:
+            sink(self.event)
+        return False
+
+    def add(self, **counters: int):
+        self.event.add(**counters)
+
+
+def enabled() -> bool:
+    return len(SINKS) > 0
+
+
+def stage(name: str):
+    """Times the enclosed block as one event, counters are attached with .add(records=..., bytes_written=...)"""
+    if not SINKS:
+        return NULL_STAGE
+    return Stage(name)
+
+
+def timed(name: str, counters: Optional[Callable[..., Dict[str, int]]] = None):
+    """Decorator form of stage(), counters(*args) is called after the function returns"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not SINKS:
+                return function(*args, **kwargs)
+            with Stage(name) as stage:
+                result = function(*args, **kwargs)
+                if counters is not None:
+                    stage.add(**counters(*args))
+            return result
+        return wrapper
+    return decorate
+
+
+def add_sink(sink: Callable[[StageEvent], None]):
+    SINKS.append(sink)
+
+
+def remove_sink(sink: Callable[[StageEvent], None]):
+    if sink in SINKS:
+        SINKS.remove(sink)
+
+
+class StatsSink:
+    """In-memory totals per stage"""
+    def __init__(self):
+        self.stages: Dict[str, StageEvent] = {}
+        self.calls: Dict[str, int] = {}
+
+    def __call__(self, event: StageEvent):
+        total = self.stages.get(event.stage)
+        if total is None:
+            total = self.stages[event.stage] = StageEvent(event.stage)
+            self.calls[event.stage] = 0
+        total.seconds += event.seconds
+        total.add(**event.counters)
+        self.calls[event.stage] += 1
+
+    def to_dict(self) -> dict:
+        return {name: dict(seconds=event.seconds, calls=self.calls[name], **event.counters) for name, event in self.stages.items()}
+
+    def report(self) -> str:
+        lines = []
+        for name, event in self.stages.items():
+            counters = "  ".join(f"{key} {value}" for key, value in event.counters.items())
+            lines.append(f"{name:<32}{self.calls[name]:>6}x {event.seconds * 1000:10.3f} ms  {counters}")
+        return "\n".join(lines)
+
+
+class LogSink:
+    def __init__(self, logger: Optional[logging.Logger] = None, level=logging.DEBUG):
+        self.logger = logger if logger is not None else logging.getLogger("pba")
+        self.level = level
+
+    def __call__(self, event: StageEvent):
+        if self.logger.isEnabledFor(self.level):
+            counters = " ".join(f"{key}={value}" for key, value in event.counters.items())
+            self.logger.log(self.level, "%s %.3f ms %s", event.stage, event.seconds * 1000, counters)
+
+
+class JSONSink:
+    """One JSON object per event and line, to a path (appended) or an open text stream"""
+    def __init__(self, target):
+        self.owned = not hasattr(target, 'write')
+        self.stream = open(target, 'a') if self.owned else target
+
+    def __call__(self, event: StageEvent):
+        self.stream.write(json.dumps({'stage': event.stage, 'seconds': event.seconds, **event.counters}) + "\n")
+
+    def close(self):
+        if self.owned:
+            self.stream.close()
+
+
+@contextmanager
+def instrumented(*sinks: Callable[[StageEvent], None]):
+    """Registers sinks for the duration of the block and yields a StatsSink with the totals"""
+    stats = StatsSink()
+    active = [stats, *sinks]
+    for sink in active:
+        add_sink(sink)
+    try:
+        yield stats
+    finally:
+        for sink in active:
+            remove_sink(sink)
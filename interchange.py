@@ -0,0 +1,197 @@
+from __future__ import annotations
+from typing import Optional, List, Dict, Tuple
+from PBA import *
+
+NPZ_VERSION = 1
+
+def data_fields(schema: RecordSchema) -> List[str]:
+    """Fields stored as columns, pointers and counts are rebuilt on export"""
+    return [name for name in schema.names
+            if name not in schema.pointer_fields and not name.endswith('_count')]
+
+
+def field_dtype(schema: RecordSchema, part: str):
+    """numpy dtype and column shape of one struct format, e.g. '3f' -> (float32, (3,))"""
+    count, code = part[:-1], part[-1]
+    if code in 'sp':
+        return np.dtype(f"S{count or 1}"), ()
+    return np.dtype(schema.endian + code), (int(count),) if count else ()
+
+
+class NameTable:
+    """Deduplicated names, stored once and referenced by index from every table"""
+    def __init__(self, names: Optional[List[str]] = None):
+        self.names: List[str] = list(names) if names is not None else []
+        self.indices: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self.segments: List[Optional[StringSegment]] = [None] * len(self.names)
+
+    def index(self, string_segment: StringSegment) -> int:
+        index = self.indices.get(string_segment.name)
+        if index is None:
+            index = self.indices[string_segment.name] = len(self.names)
+            self.names.append(string_segment.name)
+        return index
+
+    def get(self, index: int) -> StringSegment:
+        segment = self.segments[index]
+        if segment is None:
+            segment = self.segments[index] = StringSegment(self.names[index])
+        return segment
+
+
+def table_columns(prefix: str, schema: RecordSchema, records, names: NameTable) -> Dict[str, np.ndarray]:
+    """One array per field, nested records become one (N, count) array per sub-field"""
+    arrays = {}
+    for name in data_fields(schema):
+        part = schema.formats[name]
+        values = [getattr(record, name) for record in records]
+        if name in schema.string_fields:
+            arrays[f"{prefix}/{name}"] = np.array([names.index(value) for value in values], dtype=np.int32)
+        elif isinstance(part, RecordSchema):
+            count = schema.repeats[name]
+            for sub_name in data_fields(part):
+                dtype, shape = field_dtype(part, part.formats[sub_name])
+                column = np.array([[getattr(item, sub_name) for item in value] for value in values], dtype=dtype)
+                arrays[f"{prefix}/{name}.{sub_name}"] = column.reshape((len(values), count) + shape)
+        else:
+            dtype, shape = field_dtype(schema, part)
+            arrays[f"{prefix}/{name}"] = np.array(values, dtype=dtype).reshape((len(values),) + shape)
+    return arrays
+
+
+def node_columns(softbodies: List[PBASoftBody], names: NameTable) -> Dict[str, np.ndarray]:
+    """Cloth nodes of every softbody concatenated, columnar tables are sliced without going through objects"""
+    parts = []
+    for softbody in softbodies:
+        if isinstance(softbody.cloth_nodes, PBAClothNodeTable):
+            table = softbody.cloth_nodes
+            columns = {f"cloth_node/{name}": table.nodes[name].astype(field_dtype(CLOTH_NODE_SCHEMA, CLOTH_NODE_SCHEMA.formats[name])[0])
+                       for name in data_fields(CLOTH_NODE_SCHEMA) if name != 'name_segment'}
+            columns['cloth_node/name_segment'] = np.array([names.index(name) for name in table.names], dtype=np.int32)
+            parts.append(columns)
+        else:
+            parts.append(table_columns('cloth_node', CLOTH_NODE_SCHEMA, softbody.cloth_nodes, names))
+    return concatenate_columns(parts, table_columns('cloth_node', CLOTH_NODE_SCHEMA, [], names))
+
+
+def link_columns(softbodies: List[PBASoftBody], names: NameTable) -> Dict[str, np.ndarray]:
+    parts = []
+    for softbody in softbodies:
+        if isinstance(softbody.cloth_links, PBAClothLinkTable):
+            links = softbody.cloth_links.links
+            parts.append({f"cloth_link/{name}": np.ascontiguousarray(links[name]) for name in data_fields(CLOTH_LINK_SCHEMA)})
+        else:
+            parts.append(table_columns('cloth_link', CLOTH_LINK_SCHEMA, softbody.cloth_links, names))
+    return concatenate_columns(parts, table_columns('cloth_link', CLOTH_LINK_SCHEMA, [], names))
+
+
+def concatenate_columns(parts: List[Dict[str, np.ndarray]], empty: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    if len(parts) == 0:
+        return empty
+    return {key: np.concatenate([part[key] for part in parts]) for key in empty}
+
+
+def to_arrays(pba: PBA) -> Dict[str, np.ndarray]:
+    require_numpy("npz interchange")
+    names = NameTable()
+    softbodies = list(pba.softbodies)
+    arrays = {'version': np.array(NPZ_VERSION, dtype=np.int32)}
+    arrays.update(table_columns('header', PBA_HEADER_SCHEMA, [pba.header], names))
+    arrays.update(table_columns('rigidbody', RIGIDBODY_SCHEMA, list(pba.rigidbodies), names))
+    arrays.update(table_columns('constraint', CONSTRAINT_SCHEMA, list(pba.constraints), names))
+    arrays.update(table_columns('softbody', SOFTBODY_SCHEMA, softbodies, names))
+
+    # Each softbody's nodes and links are a contiguous range of the shared node and link tables
+    arrays['softbody/node_start'] = np.cumsum([0] + [len(softbody.cloth_nodes) for softbody in softbodies], dtype=np.int64)
+    arrays['softbody/link_start'] = np.cumsum([0] + [len(softbody.cloth_links) for softbody in softbodies], dtype=np.int64)
+    arrays.update(node_columns(softbodies, names))
+    arrays.update(link_columns(softbodies, names))
+    arrays['names'] = np.array(names.names, dtype=str)
+    return arrays
+
+
+def export_npz(pba: PBA, filepath, compressed=False):
+    """Writes every table as one array per field, names as a shared string array referenced by index"""
+    arrays = to_arrays(pba)
+    (np.savez_compressed if compressed else np.savez)(filepath, **arrays)
+
+
+def table_records(prefix: str, schema: RecordSchema, arrays, count: int, names: NameTable) -> List[tuple]:
+    """Rebuilds per-record value tuples in schema order, with names as name table indices and layout fields zeroed"""
+    stored = set(data_fields(schema))
+    columns = []
+    for name in schema.names:
+        part = schema.formats[name]
+        if name not in stored:
+            columns.append([0] * count)
+        elif isinstance(part, RecordSchema):
+            sub_columns = [arrays[f"{prefix}/{name}.{sub_name}"].tolist() for sub_name in part.names]
+            columns.append([[tuple(limit) for limit in zip(*[column[i] for column in sub_columns])] for i in range(count)])
+        else:
+            column = arrays[f"{prefix}/{name}"].tolist()
+            if count and isinstance(column[0], list):
+                column = [tuple(value) for value in column]
+            columns.append(column)
+    return list(zip(*columns))
+
+
+def from_arrays(arrays, columnar=True) -> PBA:
+    require_numpy("npz interchange")
+    version = int(arrays['version'])
+    if version != NPZ_VERSION:
+        raise ValueError(f"Unsupported npz interchange version {version}")
+    names = NameTable(arrays['names'].tolist())
+
+    header_values = table_records('header', PBA_HEADER_SCHEMA, arrays, 1, names)[0]
+    pba = PBA("temp")
+    pba.header.unpack_record(header_values, names.get)
+
+    rigidbodies = []
+    for values in table_records('rigidbody', RIGIDBODY_SCHEMA, arrays, len(arrays['rigidbody/name_segment']), names):
+        rigidbodies.append(PBARigidBody.decode(values, names.get))
+    pba.add_rigidbody(*rigidbodies)
+
+    constraints = []
+    for values in table_records('constraint', CONSTRAINT_SCHEMA, arrays, len(arrays['constraint/name_segment']), names):
+        constraints.append(PBAConstraint.decode(values, names.get))
+    pba.add_constraint(*constraints)
+
+    # Nodes and links are copied into the export layout column by column, never one record at a time
+    node_start = arrays['softbody/node_start'].tolist()
+    link_start = arrays['softbody/link_start'].tolist()
+    node_names = arrays['cloth_node/name_segment']
+    softbodies = []
+    for i, values in enumerate(table_records('softbody', SOFTBODY_SCHEMA, arrays, len(node_start) - 1, names)):
+        softbody = PBASoftBody("temp")
+        softbody.unpack_record(values, names.get)
+
+        nodes = PBAClothNodeTable()
+        nodes.nodes = np.zeros(node_start[i + 1] - node_start[i], dtype=CLOTH_NODE_DTYPE)
+        for name in data_fields(CLOTH_NODE_SCHEMA):
+            if name != 'name_segment':
+                nodes.nodes[name] = arrays[f"cloth_node/{name}"][node_start[i]:node_start[i + 1]]
+        nodes.names = [names.get(index) for index in node_names[node_start[i]:node_start[i + 1]].tolist()]
+
+        links = PBAClothLinkTable()
+        links.links = np.zeros(link_start[i + 1] - link_start[i], dtype=CLOTH_LINK_DTYPE)
+        for name in data_fields(CLOTH_LINK_SCHEMA):
+            links.links[name] = arrays[f"cloth_link/{name}"][link_start[i]:link_start[i + 1]]
+
+        softbody.cloth_nodes = nodes
+        softbody.cloth_links = links
+        if not columnar:
+            softbody.to_objects()
+        softbody.cloth_nodes_count = len(softbody.cloth_nodes)
+        softbody.cloth_links_count = len(softbody.cloth_links)
+        softbodies.append(softbody)
+    pba.add_softbody(*softbodies)
+
+    pba.structure_elements()
+    return pba
+
+
+def import_npz(filepath, columnar=True) -> PBA:
+    """Loads a file written by export_npz, ready for export_file. columnar=False gives per-object nodes and links"""
+    require_numpy("npz interchange")
+    with np.load(filepath, allow_pickle=False) as arrays:
+        return from_arrays(arrays, columnar)
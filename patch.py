@@ -0,0 +1,179 @@
+from __future__ import annotations
+from typing import Optional, Union, Tuple, List, Dict, Iterable
+import mmap
+import re
+import struct
+from PBA import *
+
+RecordKey = Union[int, str, Tuple[Union[int, str], Union[int, str]]]
+
+SCHEMAS: Dict[str, RecordSchema] = {
+    'header': PBAHeader.schema,
+    'rigidbody': PBARigidBody.schema,
+    'constraint': PBAConstraint.schema,
+    'softbody': PBASoftBody.schema,
+    'cloth_node': PBAClothNode.schema,
+    'cloth_link': PBAClothLink.schema,
+}
+
+FIELD_PATH = re.compile(r'^(\w+)(?:\[(\d+)\])?(?:\.(\w+))?$')
+
+
+class PBAPatcher:
+    """Overwrites scalar fields of an existing PBA in place, without importing or re-exporting it.
+
+    The file is memory mapped writable and indexed once: every record's absolute offset is known up front and
+    field offsets come from the record schemas, so each edit is a single slice write. Fields that affect the
+    layout (counts, offsets and names) and the header magic cannot be patched.
+    """
+    def __init__(self, source):
+        self.file = None
+        if isinstance(source, (bytearray, memoryview, mmap.mmap)):
+            self.buffer = source
+        else:
+            self.file = open(source, 'r+b')
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE)
+        self.structs: Dict[Tuple[str, str], Tuple[int, struct.Struct]] = {}
+        self.build_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.file is not None:
+            self.buffer.flush()
+            self.buffer.close()
+            self.file.close()
+            self.file = None
+
+    def build_index(self):
+        strings = read_container(self.buffer).strings
+        header = dict(zip(PBAHeader.schema.names, PBAHeader.schema.unpack_from(self.buffer, DATA_OFFSET)))
+        self.offsets: Dict[str, List[int]] = {'header': [DATA_OFFSET]}
+        self.names: Dict[str, Dict[str, int]] = {'header': {}}
+
+        for kind, count, offset, schema in [('rigidbody', header['rigidbody_count'], header['rigidbody_offset'], PBARigidBody.schema),
+                                            ('constraint', header['constraint_count'], header['constraint_offset'], PBAConstraint.schema)]:
+            self.offsets[kind] = [DATA_OFFSET + offset + i * schema.size for i in range(count)]
+            self.names[kind] = self.index_names(kind, strings, schema)
+
+        self.offsets['softbody'] = []
+        self.node_offsets: List[List[int]] = []
+        self.link_offsets: List[List[int]] = []
+        self.node_names: List[Dict[str, int]] = []
+        offset = header['softbody_offset']
+        for i in range(header['softbody_count']):
+            self.offsets['softbody'].append(DATA_OFFSET + offset)
+            fields = dict(zip(PBASoftBody.schema.names, PBASoftBody.schema.unpack_from(self.buffer, DATA_OFFSET + offset)))
+            nodes_start = DATA_OFFSET + fields['cloth_nodes_offset']
+            links_start = DATA_OFFSET + fields['cloth_links_offset']
+            self.node_offsets.append([nodes_start + j * CLOTH_NODE_STRIDE for j in range(fields['cloth_nodes_count'])])
+            self.link_offsets.append([links_start + j * CLOTH_LINK_STRIDE for j in range(fields['cloth_links_count'])])
+
+            node_names = {}
+            for j, node_offset in enumerate(self.node_offsets[-1]):
+                node_names.setdefault(strings.get(struct.unpack_from('<Q', self.buffer, node_offset)[0]).name, j)
+            self.node_names.append(node_names)
+
+            offset = softbody_end(fields['cloth_links_offset'], fields['cloth_links_count'])
+        self.names['softbody'] = self.index_names('softbody', strings, PBASoftBody.schema)
+
+    def index_names(self, kind: str, strings: BINAStringTable, schema: RecordSchema) -> Dict[str, int]:
+        names = {}
+        name_field = schema.offsets['name_segment']
+        for i, offset in enumerate(self.offsets[kind]):
+            names.setdefault(strings.get(struct.unpack_from('<Q', self.buffer, offset + name_field)[0]).name, i)
+        return names
+
+    def resolve(self, kind: str, index: Union[int, str]) -> int:
+        if isinstance(index, str):
+            if index not in self.names[kind]:
+                raise KeyError(f"No {kind} named '{index}'")
+            index = self.names[kind][index]
+        return index
+
+    def record_offset(self, kind: str, record: RecordKey) -> int:
+        """Absolute offset of a record. Cloth nodes and links take a (softbody, node/link) pair"""
+        if kind in ('cloth_node', 'cloth_link'):
+            if not isinstance(record, tuple) or len(record) != 2:
+                raise KeyError(f"{kind} records are given as softbody:index, got {record!r}")
+            softbody, item = record
+            softbody = self.resolve('softbody', softbody)
+            if kind == 'cloth_node':
+                if isinstance(item, str):
+                    if item not in self.node_names[softbody]:
+                        raise KeyError(f"No cloth node named '{item}'")
+                    item = self.node_names[softbody][item]
+                return self.node_offsets[softbody][item]
+            if not isinstance(item, int):
+                raise KeyError(f"Cloth links have no names, '{item}' must be a link index")
+            return self.link_offsets[softbody][item]
+        if kind not in self.offsets:
+            raise KeyError(f"Unknown record kind '{kind}', expected one of {list(SCHEMAS)}")
+        return self.offsets[kind][self.resolve(kind, record if kind != 'header' else 0)]
+
+    def field_struct(self, kind: str, field_path: str) -> Tuple[int, struct.Struct]:
+        """Offset within the record and codec of a field, e.g. 'friction' or 'limits[2].springStiffness'"""
+        key = (kind, field_path)
+        if key in self.structs:
+            return self.structs[key]
+
+        match = FIELD_PATH.match(field_path)
+        schema = SCHEMAS[kind]
+        if match is None or match.group(1) not in schema.offsets:
+            raise KeyError(f"{kind} has no field '{field_path}'")
+        name, item, sub_name = match.groups()
+        if name in schema.pointer_fields or name in schema.string_fields or name.endswith('_count'):
+            raise ValueError(f"{kind}.{name} changes the file layout and cannot be patched in place")
+        if name == 'magic':
+            raise ValueError(f"{kind}.magic identifies the file and cannot be patched")
+
+        offset = schema.offsets[name]
+        part = schema.formats[name]
+        if isinstance(part, RecordSchema):
+            if item is None or sub_name is None or int(item) >= schema.repeats[name] or sub_name not in part.offsets:
+                raise KeyError(f"{kind} has no field '{field_path}'")
+            offset += int(item) * part.size + part.offsets[sub_name]
+            part = part.formats[sub_name]
+        elif item is not None or sub_name is not None:
+            raise KeyError(f"{kind} has no field '{field_path}'")
+
+        self.structs[key] = (offset, struct.Struct(schema.endian + part))
+        return self.structs[key]
+
+    def get(self, kind: str, record: RecordKey, field_path: str):
+        offset, codec = self.field_struct(kind, field_path)
+        values = codec.unpack_from(self.buffer, self.record_offset(kind, record) + offset)
+        return values[0] if len(values) == 1 else values
+
+    def encode(self, kind: str, field_path: str, value) -> Tuple[int, bytes]:
+        """Offset within the record and packed bytes of a value, ValueError if it does not fit the field"""
+        offset, codec = self.field_struct(kind, field_path)
+        values = value if isinstance(value, (tuple, list)) else (value,)
+        try:
+            return offset, codec.pack(*values)
+        except struct.error as e:
+            raise ValueError(f"{kind}.{field_path} cannot hold {value!r}: {e}") from None
+
+    def set(self, kind: str, record: RecordKey, field_path: str, value):
+        offset, data = self.encode(kind, field_path, value)
+        offset += self.record_offset(kind, record)
+        self.buffer[offset:offset + len(data)] = data
+
+    def apply(self, edits: Iterable[Tuple[str, RecordKey, str, object]]):
+        """Resolves every edit before writing any, so a bad edit leaves the file untouched"""
+        resolved = []
+        for kind, record, field_path, value in edits:
+            offset, data = self.encode(kind, field_path, value)
+            resolved.append((self.record_offset(kind, record) + offset, data))
+        for offset, data in resolved:
+            self.buffer[offset:offset + len(data)] = data
+
+
+def patch_file(source, edits: Iterable[Tuple[str, RecordKey, str, object]]):
+    """Applies a batch of (kind, record, field, value) edits with a single open of the file"""
+    with PBAPatcher(source) as patcher:
+        patcher.apply(edits)
@@ -0,0 +1,406 @@
+from __future__ import annotations
+import argparse
+import contextlib
+import os
+import sys
+import time
+from batch import *
+from patch import PBAPatcher, patch_file
+from diff import diff_files, PBADiff
+from interchange import export_npz, import_npz
+import instrument
+from bundle import PBABundle, build_bundle
+from transform import transform_pba
+from cloth import reorder_pba, REORDER_METHODS
+from info import iter_info
+from watch import Watcher, RebuildResult
+import json
+
+
+def print_result(result: ConvertResult):
+    if not result.ok:
+        status = "FAIL"
+    elif result.same is False:
+        status = "DIFF"
+    elif result.cached is not None:
+        status = "skip" if result.cached == 'skipped' else "cache"
+    else:
+        status = "ok"
+    line = f"{status:<5}{result.seconds * 1000:9.2f} ms  {result.source}"
+    if result.error is not None:
+        line += f"\t{result.error}"
+    print(line, flush=True)
+
+
+def command_convert(args) -> int:
+    sources = find_sources(args.paths)
+    if not sources:
+        print("No .pba files found", file=sys.stderr)
+        return 1
+
+    output_dir = None if args.verify_only else args.output
+    if output_dir is None and not args.verify_only:
+        print("convert needs --output, or --verify-only", file=sys.stderr)
+        return 1
+
+    cache = None
+    if args.cache is not None and output_dir is not None:
+        cache = BuildCache(args.cache, int(args.cache_size * 1024 * 1024))
+    settings = {'version': "210", 'big_endian': False}
+
+    sinks = [instrument.JSONSink(args.profile_json)] if args.profile_json else []
+    with instrument.instrumented(*sinks) if args.profile or sinks else contextlib.nullcontext() as stats:
+        start = time.perf_counter()
+        jobs = 1 if stats is not None else args.jobs
+        results = run_batch(sources, output_dir, jobs, args.verify or args.verify_only, args.columnar, print_result, cache, settings)
+        elapsed = time.perf_counter() - start
+    for sink in sinks:
+        sink.close()
+    if stats is not None:
+        print(stats.report())
+
+    failed = [result for result in results if not result.ok]
+    cached = [result for result in results if result.cached is not None]
+    different = [result for result in results if result.same is False]
+    total_bytes = sum(result.size for result in results)
+    print(f"{len(results)} files, {len(failed)} failed, {len(different)} different, {len(cached)} from cache, "
+          f"{elapsed:.2f} s ({len(results) / elapsed:.1f} files/s, {total_bytes / elapsed / 1e6:.2f} MB/s)")
+    return 1 if failed or different else 0
+
+
+def parse_edit(text: str):
+    """kind/record/field=value, where record is an index or name and cloth records take softbody:node"""
+    target, _, value = text.partition('=')
+    kind, record, field_path = target.split('/', 2)
+    record_keys = [int(part) if part.lstrip('-').isdigit() else part for part in record.split(':')]
+    values = tuple(float(part) if '.' in part or 'e' in part.lower() else int(part) for part in value.split(','))
+    return kind, tuple(record_keys) if len(record_keys) > 1 else record_keys[0], field_path, values if len(values) > 1 else values[0]
+
+
+def command_patch(args) -> int:
+    try:
+        edits = [parse_edit(text) for text in args.edits]
+    except ValueError as e:
+        print(f"Malformed edit: {e}", file=sys.stderr)
+        return 1
+    try:
+        patch_file(args.file, edits)
+    except (KeyError, ValueError, IndexError) as e:
+        print(f"Patch failed: {e}", file=sys.stderr)
+        return 1
+    print(f"{len(edits)} fields patched in {args.file}")
+    return 0
+
+
+def command_diff(args) -> int:
+    """Diffs two files, or every file pair with the same relative path under two directories"""
+    if os.path.isdir(args.left) and os.path.isdir(args.right):
+        left = dict((name, source) for source, name in find_sources([args.left]))
+        right = dict((name, source) for source, name in find_sources([args.right]))
+        pairs = [(left[name], right[name]) for name in sorted(left) if name in right]
+        only_left = sorted(name for name in left if name not in right)
+        only_right = sorted(name for name in right if name not in left)
+    else:
+        pairs = [(args.left, args.right)]
+        only_left, only_right = [], []
+
+    start = time.perf_counter()
+    results = []
+    for left_path, right_path in pairs:
+        try:
+            result = diff_files(left_path, right_path, args.rel_tol, args.abs_tol)
+        except Exception as e:
+            print(f"FAIL {left_path}\t{type(e).__name__}: {e}", file=sys.stderr)
+            result = PBADiff(left_path, right_path)
+            result.skipped = ['error']
+        results.append(result)
+        if not result.identical and not args.quiet:
+            print(f"--- {result.left}\n+++ {result.right}")
+            for record in result.records:
+                print(record)
+    elapsed = time.perf_counter() - start
+
+    for name in only_left:
+        print(f"- file {name}")
+    for name in only_right:
+        print(f"+ file {name}")
+    changed = [result for result in results if not result.identical]
+    errors = [result for result in results if result.skipped == ['error']]
+    print(f"{len(results)} pairs, {len(changed)} different, {len(errors)} failed, {len(only_left)} removed, {len(only_right)} added, {elapsed:.2f} s")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'pairs': [result.to_dict() for result in changed], 'removed': only_left, 'added': only_right}, file, indent=2)
+    return 1 if changed or errors or only_left or only_right else 0
+
+
+def command_npz(args) -> int:
+    """Direction follows the source extension: .pba to .npz, or .npz back to .pba through the normal export"""
+    if args.source.lower().endswith('.npz'):
+        pba = import_npz(args.source, columnar=True)
+        pba.export_file(args.output)
+    else:
+        pba = PBA("temp")
+        pba.import_file(args.source, columnar=np is not None)
+        export_npz(pba, args.output, args.compressed)
+    print(f"{args.source} -> {args.output}")
+    return 0
+
+
+def command_bundle_build(args) -> int:
+    sources = find_sources(args.paths)
+    if not sources:
+        print("No .pba files found", file=sys.stderr)
+        return 1
+    if args.check:
+        for source, _ in sources:
+            with open(source, 'rb') as file:
+                try:
+                    check_pba(file.read())
+                except ValueError as e:
+                    print(f"FAIL {source}\t{e}", file=sys.stderr)
+                    return 1
+    entries = [(os.path.splitext(name)[0].replace(os.sep, '/'), source) for source, name in sources]
+    entry_count, blob_count = build_bundle(entries, args.output)
+    print(f"{args.output}: {entry_count} entries, {blob_count} unique files, {os.path.getsize(args.output)} bytes")
+    return 0
+
+
+def command_bundle_list(args) -> int:
+    with PBABundle(args.bundle) as bundle:
+        entries = bundle.entries()
+    if args.json:
+        print(json.dumps([{'name': entry.name, 'blob': entry.blob, 'offset': entry.offset, 'size': entry.size,
+                           'digest': entry.digest.hex()} for entry in entries], indent=2))
+    else:
+        for entry in entries:
+            print(f"{entry.size:>10}  {entry.digest.hex()[:12]}  {entry.name}")
+    return 0
+
+
+def command_bundle_extract(args) -> int:
+    with PBABundle(args.bundle) as bundle:
+        try:
+            paths = bundle.extract(args.output, args.names or None)
+        except KeyError as e:
+            print(e, file=sys.stderr)
+            return 1
+    print(f"{len(paths)} files extracted to {args.output}")
+    return 0
+
+
+def command_transform(args) -> int:
+    """Loads every source, transforms all of their frames in one batch and writes them under the output directory"""
+    sources = find_sources(args.paths)
+    if not sources:
+        print("No .pba files found", file=sys.stderr)
+        return 1
+    pbas = []
+    names = []
+    failed = 0
+    for source, name in sources:
+        pba = PBA("temp")
+        try:
+            pba.import_file(source)
+        except Exception as e:
+            print(f"FAIL {source}\t{type(e).__name__}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        pbas.append(pba)
+        names.append(name)
+
+    start = time.perf_counter()
+    scale = args.scale[0] if args.scale is not None and len(args.scale) == 1 else args.scale
+    frames = transform_pba(*pbas, mirror=args.mirror, scale=scale, rotate=args.rotate, translate=args.translate)
+    elapsed = time.perf_counter() - start
+
+    for pba, name in zip(pbas, names):
+        output = os.path.join(args.output, name)
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        pba.export_file(output)
+    print(f"{len(pbas)} files, {failed} failed, {len(frames)} frames transformed in {elapsed * 1000:.2f} ms")
+    return 1 if failed else 0
+
+
+def command_reorder(args) -> int:
+    """Renumbers cloth nodes of every softbody for locality and reports bandwidth before and after"""
+    sources = find_sources(args.paths)
+    if not sources:
+        print("No .pba files found", file=sys.stderr)
+        return 1
+    report = []
+    failed = 0
+    for source, name in sources:
+        pba = PBA("temp")
+        try:
+            pba.import_file(source, columnar=True)
+            results = reorder_pba(pba, args.method, not args.force)
+        except Exception as e:
+            print(f"FAIL {source}\t{type(e).__name__}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        for result in results:
+            print(f"{result.bandwidth_before:>6} -> {result.bandwidth_after:<6} {result.nodes:>6} nodes  {source}:{result.softbody}")
+        report.append({'source': source, 'softbodies': [result.to_dict() for result in results]})
+        if args.output is not None:
+            output = os.path.join(args.output, name)
+            os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+            pba.export_file(output)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+    return 1 if failed else 0
+
+
+def command_info(args) -> int:
+    """Reads only the headers of each file, one file at a time"""
+    sources = [source for source, _ in find_sources(args.paths)]
+    if not sources:
+        print("No .pba files found", file=sys.stderr)
+        return 1
+    start = time.perf_counter()
+    failed = 0
+    if args.json:
+        print("[")
+    for i, info in enumerate(iter_info(sources, args.softbodies)):
+        failed += not info.ok
+        if args.json:
+            print(("  " if i == 0 else " ,") + json.dumps(info.to_dict()))
+        elif not info.ok:
+            print(f"FAIL {info.path}\t{info.error}")
+        else:
+            print(f"{info.rigidbody_count:>5} rb {info.constraint_count:>5} con {info.softbody_count:>3} sb  {info.name:<24} {info.path}")
+            for softbody in info.softbodies or []:
+                print(f"{'':>30}{softbody.nodes:>6} nodes {softbody.links:>6} links  {softbody.name}")
+    if args.json:
+        print("]")
+    elapsed = time.perf_counter() - start
+    print(f"{len(sources)} files, {failed} failed, {elapsed:.2f} s ({len(sources) / max(elapsed, 1e-9):.0f} files/s)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def print_rebuild(result: RebuildResult):
+    status = "ok" if result.ok else "FAIL"
+    line = f"{status:<5}{result.latency * 1000:9.2f} ms latency {result.seconds * 1000:9.2f} ms build {result.saves:>3} saves  {result.source}"
+    if result.error is not None:
+        line += f"\t{result.error}"
+    print(line, flush=True)
+
+
+def command_watch(args) -> int:
+    """Rebuilds the outputs of changed sources until interrupted, or once with --once"""
+    if not os.path.isdir(args.source):
+        print(f"{args.source} is not a directory", file=sys.stderr)
+        return 1
+    with Watcher(args.source, args.output, args.jobs, args.interval, args.debounce, args.columnar, print_rebuild) as watcher:
+        if not args.once:
+            print(f"Watching {args.source} -> {args.output}, Ctrl+C to stop", file=sys.stderr)
+        watcher.run(rebuild_all=args.all, until_idle=args.once)
+    failed = [result for result in watcher.results if not result.ok]
+    if watcher.results:
+        latencies = sorted(result.latency for result in watcher.results)
+        print(f"{len(watcher.results)} rebuilds, {len(failed)} failed, median latency {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+              f"max {latencies[-1] * 1000:.2f} ms", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="pbatool", description="HE2 physical skeleton (.pba) tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="import and re-export .pba files")
+    convert.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    convert.add_argument("-o", "--output", help="output directory, relative paths under input directories are kept")
+    convert.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    convert.add_argument("--verify", action="store_true", help="also compare each re-export against its source")
+    convert.add_argument("--verify-only", action="store_true", help="dry run: compare re-exports against sources without writing")
+    convert.add_argument("--columnar", action="store_true", help="store cloth nodes and links as numpy tables")
+    convert.add_argument("--cache", help="build cache directory, unchanged inputs are skipped or restored from it")
+    convert.add_argument("--cache-size", type=float, default=512, help="cache size limit in MiB, least recently used outputs are evicted")
+    convert.add_argument("--profile", action="store_true", help="print time and counters per import/export stage, runs in one process")
+    convert.add_argument("--profile-json", help="also append every stage event to this file as JSON lines")
+    convert.set_defaults(func=command_convert)
+
+    info = commands.add_parser("info", aliases=["ls"], help="list name and record counts from the headers only")
+    info.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    info.add_argument("--softbodies", action="store_true", help="also list node and link counts per softbody")
+    info.add_argument("--json", action="store_true", help="print a JSON array with one object per file")
+    info.set_defaults(func=command_info)
+
+    patch = commands.add_parser("patch", help="overwrite fields of a .pba in place without re-exporting it")
+    patch.add_argument("file")
+    patch.add_argument("edits", nargs="+", help="kind/record/field=value, e.g. rigidbody/Calf_L/friction=0.4, "
+                                                "constraint/0/limits[2].springStiffness=50, cloth_node/cloth:3/mass=2, rigidbody/0/offsetPosition=1,2,3")
+    patch.set_defaults(func=command_patch)
+
+    diff = commands.add_parser("diff", help="report added, removed and changed records between two files or directories")
+    diff.add_argument("left")
+    diff.add_argument("right")
+    diff.add_argument("--rel-tol", type=float, default=1e-6, help="relative tolerance for float fields")
+    diff.add_argument("--abs-tol", type=float, default=1e-6, help="absolute tolerance for float fields")
+    diff.add_argument("--json", help="write the differences here")
+    diff.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    diff.set_defaults(func=command_diff)
+
+    npz = commands.add_parser("npz", help="convert between .pba and the columnar .npz interchange format")
+    npz.add_argument("source", help=".pba to write as .npz, or .npz to write back as .pba")
+    npz.add_argument("output")
+    npz.add_argument("--compressed", action="store_true", help="deflate the arrays when writing .npz")
+    npz.set_defaults(func=command_npz)
+
+    transform = commands.add_parser("transform", help="mirror, scale, rotate and translate rigidbody and constraint offset frames")
+    transform.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    transform.add_argument("-o", "--output", required=True, help="output directory, relative paths under input directories are kept")
+    transform.add_argument("--mirror", choices=("x", "y", "z"), help="reflect across this axis, treating bone-local offsets as world space, and swap frames between _L and _R records")
+    transform.add_argument("--scale", type=float, nargs="+", help="one uniform factor, or one per axis")
+    transform.add_argument("--rotate", type=float, nargs=4, metavar=("X", "Y", "Z", "W"), help="quaternion")
+    transform.add_argument("--translate", type=float, nargs=3, metavar=("X", "Y", "Z"))
+    transform.set_defaults(func=command_transform)
+
+    reorder = commands.add_parser("reorder", help="renumber cloth nodes so linked nodes are stored close together")
+    reorder.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    reorder.add_argument("-o", "--output", help="output directory, only reports bandwidth without it")
+    reorder.add_argument("--method", choices=REORDER_METHODS, default="cm", help="Cuthill-McKee, reverse Cuthill-McKee or plain breadth-first")
+    reorder.add_argument("--force", action="store_true", help="apply the new order even where it does not lower the bandwidth")
+    reorder.add_argument("--json", help="write the per-softbody report here")
+    reorder.set_defaults(func=command_reorder)
+
+    watch = commands.add_parser("watch", help="rebuild outputs whenever their .pba or .npz sources change")
+    watch.add_argument("source", help="source directory, searched recursively")
+    watch.add_argument("-o", "--output", required=True, help="output directory, relative paths are kept")
+    watch.add_argument("-j", "--jobs", type=int, default=min(os.cpu_count() or 1, 4), help="worker processes")
+    watch.add_argument("--interval", type=float, default=0.25, help="seconds between polls")
+    watch.add_argument("--debounce", type=float, default=0.3, help="seconds a source must stay unchanged before it is rebuilt")
+    watch.add_argument("--columnar", action="store_true", help="store cloth nodes and links as numpy tables")
+    watch.add_argument("--all", action="store_true", help="rebuild every source on start, not only those newer than their output")
+    watch.add_argument("--once", action="store_true", help="rebuild out of date outputs and exit")
+    watch.set_defaults(func=command_watch)
+
+    bundle = commands.add_parser("bundle", help="pack many .pba files into one indexed, deduplicated bundle")
+    bundle_commands = bundle.add_subparsers(dest="bundle_command", required=True)
+    bundle_build = bundle_commands.add_parser("build", help="bundle files, entries are named by relative path without extension")
+    bundle_build.add_argument("output")
+    bundle_build.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    bundle_build.add_argument("--check", action="store_true", help="reject files that fail the PBA header checks")
+    bundle_build.set_defaults(func=command_bundle_build)
+    bundle_list = bundle_commands.add_parser("list", help="list entries with their size and content digest")
+    bundle_list.add_argument("bundle")
+    bundle_list.add_argument("--json", action="store_true")
+    bundle_list.set_defaults(func=command_bundle_list)
+    bundle_extract = bundle_commands.add_parser("extract", help="write entries back out as .pba files")
+    bundle_extract.add_argument("bundle")
+    bundle_extract.add_argument("names", nargs="*", help="entries to extract, all by default")
+    bundle_extract.add_argument("-o", "--output", default=".")
+    bundle_extract.set_defaults(func=command_bundle_extract)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Bulk transforms of the offset frames of rigidbodies and constraints.
+
+Frames of any number of files are gathered into one (N, 3) position and one (N, 4) rotation array,
+transformed with numpy and scattered back. Rotations are quaternions stored as in the file, x y z w.
+
+    frames = PBAFrames.gather(*library)
+    frames.mirror('x').scale(1.5).scatter()
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import List, Tuple, Union, Sequence
+from PBA import *
+
+FRAME_FIELDS = {
+    'rigidbody': (('offsetPosition', 'offsetRotation'),),
+    'constraint': (('offsetPosition1', 'offsetRotation1'), ('offsetPosition2', 'offsetRotation2')),
+}
+"""(position field, rotation field) pairs per record kind"""
+
+SIDE_TOKENS = {'L': 'R', 'R': 'L', 'Left': 'Right', 'Right': 'Left', 'l': 'r', 'r': 'l'}
+AXES = {'x': 0, 'y': 1, 'z': 2}
+
+
+def mirror_name(name: str) -> str:
+    """Swaps side tokens between underscores, e.g. Thigh_L -> Thigh_R and Pipe1_A_L -> Pipe1_A_R"""
+    return '_'.join(SIDE_TOKENS.get(token, token) for token in name.split('_'))
+
+
+def quaternion_multiply(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Hamilton product of x y z w quaternions, broadcast over leading dimensions"""
+    ax, ay, az, aw = np.moveaxis(a, -1, 0)
+    bx, by, bz, bw = np.moveaxis(b, -1, 0)
+    return np.stack((
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+        aw * bw - ax * bx - ay * by - az * bz,
+    ), axis=-1)
+
+
+def quaternion_rotate(quaternion: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Rotates (N, 3) vectors by a unit x y z w quaternion"""
+    axis = quaternion[..., :3]
+    t = 2.0 * np.cross(axis, vectors)
+    return vectors + quaternion[..., 3:] * t + np.cross(axis, t)
+
+
+@dataclass
+class PBAFrames:
+    """Offset frames of one or more files, row i is field pair slots[i] of record records[i]"""
+    positions: np.ndarray
+    rotations: np.ndarray
+    records: List[BINASegment]
+    slots: List[Tuple[str, str]]
+    keys: List[Tuple[int, str, str]]
+    """(file index, position field, record name) per row, used to pair left and right records when mirroring"""
+
+    @classmethod
+    def gather(cls, *pbas: PBA) -> PBAFrames:
+        require_numpy("Bulk transforms")
+        positions, rotations, records, slots, keys = [], [], [], [], []
+        for file_index, pba in enumerate(pbas):
+            for kind, kind_records in (('rigidbody', pba.rigidbodies), ('constraint', pba.constraints)):
+                kind_records = list(kind_records)
+                for position_field, rotation_field in FRAME_FIELDS[kind]:
+                    positions.extend(getattr(record, position_field) for record in kind_records)
+                    rotations.extend(getattr(record, rotation_field) for record in kind_records)
+                    records.extend(kind_records)
+                    slots.extend([(position_field, rotation_field)] * len(kind_records))
+                    keys.extend((file_index, position_field, record.name_segment.name) for record in kind_records)
+        return cls(np.array(positions, dtype=np.float64).reshape(-1, 3),
+                   np.array(rotations, dtype=np.float64).reshape(-1, 4),
+                   records, slots, keys)
+
+    def __len__(self):
+        return len(self.records)
+
+    def scatter(self):
+        """Writes the arrays back to their records as tuples, rounded to the stored float32 precision"""
+        positions = self.positions.astype(np.float32).tolist()
+        rotations = self.rotations.astype(np.float32).tolist()
+        for record, (position_field, rotation_field), position, rotation in zip(self.records, self.slots, positions, rotations):
+            setattr(record, position_field, tuple(position))
+            setattr(record, rotation_field, tuple(rotation))
+
+    def translate(self, offset: Union[Sequence[float], np.ndarray]) -> PBAFrames:
+        """Adds a (3,) offset, or one per row as (N, 3)"""
+        self.positions += np.asarray(offset, dtype=np.float64)
+        return self
+
+    def scale(self, factor: Union[float, Sequence[float], np.ndarray]) -> PBAFrames:
+        """Scales positions uniformly or per axis. Rotations are kept, shape radius and height are not touched"""
+        self.positions *= np.asarray(factor, dtype=np.float64)
+        return self
+
+    def rotate(self, quaternion: Union[Sequence[float], np.ndarray]) -> PBAFrames:
+        """Applies an x y z w rotation to every position and composes it before every frame rotation"""
+        quaternion = np.asarray(quaternion, dtype=np.float64)
+        quaternion = quaternion / np.linalg.norm(quaternion, axis=-1, keepdims=True)
+        self.positions = quaternion_rotate(quaternion, self.positions)
+        self.rotations = quaternion_multiply(quaternion, self.rotations)
+        return self
+
+    def mirror(self, axis: Union[str, int] = 'x', swap_sides=True) -> PBAFrames:
+        """Reflects every frame across the plane normal to axis.
+        With swap_sides, a record whose name has a counterpart on the other side (Thigh_L, Thigh_R)
+        takes the reflected frame of that counterpart, records without one are reflected in place.
+
+        Offsets are local to each record's bone, but the file holds no bone frames, so the reflection is
+        applied to the stored values as if every bone shared one world frame. Rigs whose left and right bones
+        have mirrored local axes already store equal offsets on both sides (chr_sage: Thigh_L and Thigh_R
+        both at x=0.08), and reflecting those leaves both at -0.08, so the result is no longer symmetric"""
+        axis = AXES.get(axis, axis)
+        others = [i for i in range(3) if i != axis]
+        self.positions[:, axis] *= -1.0
+        self.rotations[:, others] *= -1.0
+
+        if swap_sides:
+            rows = {key: i for i, key in enumerate(self.keys)}
+            order = np.array([rows.get((file_index, position_field, mirror_name(name)), i)
+                              for i, (file_index, position_field, name) in enumerate(self.keys)], dtype=np.int64)
+            self.positions = self.positions[order]
+            self.rotations = self.rotations[order]
+        return self
+
+
+def transform_pba(*pbas: PBA, mirror: Union[None, str, int] = None, scale=None, rotate=None, translate=None) -> PBAFrames:
+    """Mirrors, scales, rotates and translates every frame of the given files in that order, in one batch"""
+    frames = PBAFrames.gather(*pbas)
+    if mirror is not None:
+        frames.mirror(mirror)
+    if scale is not None:
+        frames.scale(scale)
+    if rotate is not None:
+        frames.rotate(rotate)
+    if translate is not None:
+        frames.translate(translate)
+    frames.scatter()
+    return frames
@@ -0,0 +1,226 @@
+"""Watch mode: polls a source directory and rebuilds the outputs of changed sources in the background.
+
+A burst of saves to one source is coalesced into one rebuild once the file has been quiet for the debounce time.
+Rebuilds run in a worker pool, so polling continues while they run, and a source saved again during its own
+rebuild is queued once more when that rebuild finishes. Only outputs of changed sources are written.
+
+    with Watcher("sources/", "output/", jobs=4, callback=print) as watcher:
+        watcher.run()
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Optional, List, Tuple, Dict, Callable
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+import os
+import signal
+import time
+from PBA import *
+from batch import convert_file
+from interchange import import_npz
+
+WATCH_EXTENSIONS = ('.pba', '.npz')
+"""Sources that map to one .pba output each, .npz through the columnar interchange format"""
+
+
+@dataclass
+class RebuildResult:
+    source: str
+    output: str
+    ok: bool = False
+    seconds: float = 0.0
+    """Time spent building"""
+    latency: float = 0.0
+    """From the first detected save of the burst to the output being written"""
+    saves: int = 1
+    """Changes seen while the burst was debounced"""
+    error: Optional[str] = field(default=None, repr=False)
+
+
+def rebuild(source: str, output: str, columnar=False) -> RebuildResult:
+    """Builds one output, written to a temporary file first so readers never see it half written"""
+    result = RebuildResult(source, output)
+    start = time.perf_counter()
+    tmp_path = f"{output}.tmp"
+    try:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        if source.lower().endswith('.npz'):
+            import_npz(source, columnar=True).export_file(tmp_path)
+        else:
+            converted = convert_file(source, tmp_path, columnar=columnar)
+            result.error = converted.error
+        if result.error is None:
+            os.replace(tmp_path, output)
+            result.ok = True
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    if not result.ok and os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def ignore_interrupt():
+    """Workers leave Ctrl+C to the watcher, which shuts the pool down"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def scan_sources(directory: str, extensions=WATCH_EXTENSIONS, exclude: Optional[str] = None) -> Dict[str, Tuple[int, int]]:
+    """(mtime in ns, size) of every source under directory, one stat per file"""
+    found = {}
+    stack = [directory]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if exclude is None or os.path.normpath(entry.path) != exclude:
+                        stack.append(entry.path)
+                elif entry.name.lower().endswith(extensions):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    found[os.path.normpath(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+    return found
+
+
+class Watcher:
+    """Polls source_dir every interval seconds and rebuilds the matching outputs under output_dir"""
+    def __init__(self, source_dir: str, output_dir: str, jobs: int = 1, interval=0.25, debounce=0.3, columnar=False,
+                 callback: Optional[Callable[[RebuildResult], None]] = None, extensions=WATCH_EXTENSIONS):
+        self.source_dir = os.path.normpath(source_dir)
+        self.output_dir = os.path.normpath(output_dir)
+        self.interval = interval
+        self.debounce = debounce
+        self.columnar = columnar
+        self.callback = callback
+        self.extensions = extensions
+        self.pool = ProcessPoolExecutor(max_workers=max(jobs, 1), initializer=ignore_interrupt)
+        self.snapshot: Dict[str, Tuple[int, int]] = {}
+        self.pending: Dict[str, List[float]] = {}
+        """source -> [first change, last change, saves] of a burst still being debounced"""
+        self.running: Dict[str, Tuple[Future, float, int]] = {}
+        """source -> (future, first change, saves)"""
+        self.results: List[RebuildResult] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def output_path(self, source: str) -> str:
+        name = os.path.splitext(os.path.relpath(source, self.source_dir))[0] + ".pba"
+        return os.path.join(self.output_dir, name)
+
+    def output_sources(self) -> Dict[str, List[str]]:
+        """output -> every source in the snapshot that builds it, more than one when only the extension differs"""
+        outputs = {}
+        for source in self.snapshot:
+            outputs.setdefault(self.output_path(source), []).append(source)
+        return outputs
+
+    def start(self, rebuild_all=False) -> List[str]:
+        """Takes the first snapshot and queues sources whose output is missing or older, or every source with rebuild_all"""
+        self.snapshot = scan_sources(self.source_dir, self.extensions, self.output_dir)
+        now = time.perf_counter()
+        stale = []
+        for source, (mtime, _) in sorted(self.snapshot.items()):
+            output = self.output_path(source)
+            if rebuild_all or not os.path.exists(output) or os.stat(output).st_mtime_ns < mtime:
+                self.pending[source] = [now, now - self.debounce, 1]
+                stale.append(source)
+        return stale
+
+    def poll(self, now: float) -> int:
+        """Diffs a fresh snapshot against the last one, returns the number of changed sources"""
+        snapshot = scan_sources(self.source_dir, self.extensions, self.output_dir)
+        changed = 0
+        for source, state in snapshot.items():
+            if self.snapshot.get(source) != state:
+                burst = self.pending.get(source)
+                if burst is None:
+                    self.pending[source] = [now, now, 1]
+                else:
+                    burst[1] = now
+                    burst[2] += 1
+                changed += 1
+        for source in self.snapshot.keys() - snapshot.keys():
+            self.pending.pop(source, None)
+        self.snapshot = snapshot
+        return changed
+
+    def submit_ready(self, now: float) -> int:
+        """Starts every debounced source that is not already being rebuilt.
+        Sources that share an output with another source are reported as failed instead of racing to write it"""
+        submitted = 0
+        outputs = None
+        for source, (first, last, saves) in list(self.pending.items()):
+            if now - last < self.debounce or source in self.running or source not in self.snapshot:
+                continue
+            del self.pending[source]
+            if outputs is None:
+                outputs = self.output_sources()
+            output = self.output_path(source)
+            others = [other for other in outputs[output] if other != source]
+            if others:
+                result = RebuildResult(source, output, latency=time.perf_counter() - first, saves=saves,
+                                       error=f"{others[0]} builds the same output")
+                self.finish(result)
+                continue
+            future = self.pool.submit(rebuild, source, output, self.columnar)
+            self.running[source] = (future, first, saves)
+            submitted += 1
+        return submitted
+
+    def collect(self) -> List[RebuildResult]:
+        """Results of finished rebuilds, without waiting on the ones still running"""
+        finished = []
+        for source, (future, first, saves) in list(self.running.items()):
+            if not future.done():
+                continue
+            del self.running[source]
+            result = future.result()
+            result.latency = time.perf_counter() - first
+            result.saves = saves
+            finished.append(result)
+            self.finish(result)
+        return finished
+
+    def finish(self, result: RebuildResult):
+        self.results.append(result)
+        if self.callback is not None:
+            self.callback(result)
+
+    @property
+    def idle(self) -> bool:
+        return not self.pending and not self.running
+
+    def step(self) -> List[RebuildResult]:
+        now = time.perf_counter()
+        self.poll(now)
+        self.submit_ready(now)
+        return self.collect()
+
+    def wait(self):
+        """Sleeps one interval, returning early when a rebuild finishes so its latency is not padded"""
+        if self.running:
+            wait([future for future, _, _ in self.running.values()], timeout=self.interval, return_when=FIRST_COMPLETED)
+        else:
+            time.sleep(self.interval)
+
+    def run(self, duration: Optional[float] = None, rebuild_all=False, until_idle=False):
+        """Polls until interrupted, for duration seconds, or with until_idle until every queued rebuild has finished"""
+        self.start(rebuild_all)
+        end = None if duration is None else time.perf_counter() + duration
+        try:
+            while end is None or time.perf_counter() < end:
+                self.step()
+                if until_idle and self.idle:
+                    break
+                self.wait()
+        except KeyboardInterrupt:
+            pass
+        self.collect()